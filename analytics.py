@@ -0,0 +1,107 @@
+import time
+import heapq
+
+
+class TopK:
+    def __init__(self, k=10):
+        self.k = k
+        self.heap = []
+        self.entries = {}
+
+    def update(self, query, count):
+        entry = self.entries.get(query)
+        if entry is not None:
+            entry[0] = count
+            heapq.heapify(self.heap)
+        elif len(self.heap) < self.k:
+            entry = [count, query]
+            self.entries[query] = entry
+            heapq.heappush(self.heap, entry)
+        elif count > self.heap[0][0]:
+            entry = [count, query]
+            removed = heapq.heapreplace(self.heap, entry)
+            del self.entries[removed[1]]
+            self.entries[query] = entry
+
+    def items(self):
+        return [(query, count) for count, query in sorted(self.heap, reverse=True)]
+
+
+class SpaceSaving:
+    def __init__(self, capacity=200):
+        self.capacity = capacity
+        self.counts = {}
+        self.total = 0
+
+    def add(self, query, amount=1):
+        self.total += amount
+        if query in self.counts:
+            self.counts[query] += amount
+        elif len(self.counts) < self.capacity:
+            self.counts[query] = amount
+        else:
+            smallest = min(self.counts, key=self.counts.get)
+            self.counts[query] = self.counts.pop(smallest) + amount
+
+
+class SlidingWindow:
+    def __init__(self, bucket_seconds, buckets, capacity=200):
+        self.bucket_seconds = bucket_seconds
+        self.capacity = capacity
+        self.buckets = [None] * buckets
+        self.starts = [0] * buckets
+
+    def current(self, now):
+        start = int(now // self.bucket_seconds)
+        index = start % len(self.buckets)
+        if self.starts[index] != start or self.buckets[index] is None:
+            self.buckets[index] = SpaceSaving(self.capacity)
+            self.starts[index] = start
+        return self.buckets[index]
+
+    def add(self, query, now=None):
+        self.current(now or time.time()).add(query)
+
+    def live(self, now):
+        oldest = int(now // self.bucket_seconds) - len(self.buckets) + 1
+        return [bucket for bucket, start in zip(self.buckets, self.starts) if bucket is not None and start >= oldest]
+
+    def total(self, now=None):
+        return sum(bucket.total for bucket in self.live(now or time.time()))
+
+    def counts(self, now=None):
+        merged = {}
+        for bucket in self.live(now or time.time()):
+            for query, count in bucket.counts.items():
+                merged[query] = merged.get(query, 0) + count
+        return merged
+
+    def top(self, k=10, now=None):
+        return heapq.nlargest(k, self.counts(now).items(), key=lambda item: item[1])
+
+
+class QueryAnalytics:
+    def __init__(self, total=0, top=None, k=10, capacity=200):
+        self.total = total
+        self.top = TopK(k)
+        for query, count in top or []:
+            self.top.update(query, count)
+        self.windows = {
+            "hour": SlidingWindow(300, 12, capacity),
+            "day": SlidingWindow(3600, 24, capacity),
+            "week": SlidingWindow(86400, 7, capacity)
+        }
+
+    def record(self, query, count):
+        now = time.time()
+        self.total += 1
+        self.top.update(query, count)
+        for window in self.windows.values():
+            window.add(query, now)
+
+    def snapshot(self, k=10):
+        return {
+            "total": self.total,
+            "top": self.top.items(),
+            "windows": {name: {"total": window.total(), "top": window.top(k)} for name, window in self.windows.items()}
+        }
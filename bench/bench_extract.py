@@ -0,0 +1,110 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import extract
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+RECORD_URLS = {
+    "google": ("https://www.google.com/search", {"num": 5}),
+    "bing": ("https://www.bing.com/search", {})
+}
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+}
+
+
+def legacy_google(html):
+    results = []
+    soup = BeautifulSoup(html, 'html.parser')
+    for g in soup.find_all('div', class_='g'):
+        title = g.find('h3')
+        description = g.find('div', class_='VwiC3b')
+        link = g.find('a')
+        if title and description and link:
+            results.append({
+                "source": "Google",
+                "title": title.get_text(),
+                "content": description.get_text(),
+                "url": link.get('href', '')
+            })
+    if not results:
+        divs = soup.find_all('div', class_='BNeawe')
+        for i, div in enumerate(divs[:5]):
+            results.append({
+                "source": "Google",
+                "title": f"Natija {i+1}",
+                "content": div.get_text()
+            })
+    return results
+
+
+def legacy_bing(html):
+    results = []
+    soup = BeautifulSoup(html, 'html.parser')
+    for result in soup.find_all('li', class_='b_algo')[:3]:
+        title = result.find('h2')
+        desc = result.find('p')
+        link = result.find('a')
+        if title and desc:
+            results.append({
+                "source": "Bing",
+                "title": title.get_text(),
+                "content": desc.get_text(),
+                "url": link.get('href', '') if link else ''
+            })
+    return results
+
+
+LEGACY = {"google": legacy_google, "bing": legacy_bing}
+
+
+def timed(func, html, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        result = func(html)
+    return (time.perf_counter() - started) / iterations * 1000, result
+
+
+async def record(query):
+    from http_client import HttpPool
+    pool = HttpPool()
+    try:
+        for engine, (url, params) in RECORD_URLS.items():
+            response = await pool.get(url, params={"q": query, **params}, headers=HEADERS, timeout=15)
+            with open(os.path.join(FIXTURES, f"{engine}.html"), "w", encoding="utf-8") as f:
+                f.write(response.text())
+            print(f"💾 {engine}: {len(response.body)} bytes")
+    finally:
+        await pool.close()
+
+
+def run(iterations):
+    print(f"parser: {extract.PARSER}, iterations: {iterations}\n")
+    for engine in ("google", "bing"):
+        with open(os.path.join(FIXTURES, f"{engine}.html"), encoding="utf-8") as f:
+            html = f.read()
+        legacy_ms, legacy_result = timed(LEGACY[engine], html, iterations)
+        print(f"{engine} ({len(html) // 1024} KB)")
+        print(f"  legacy html.parser   {legacy_ms:8.2f} ms")
+        for parser, extractors in extract.EXTRACTORS.items():
+            ms, result = timed(extractors[engine], html, iterations)
+            status = "ok" if result == legacy_result else "MISMATCH"
+            print(f"  {parser:<20} {ms:8.2f} ms  x{legacy_ms / ms:5.1f}  {status}")
+        print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--record", metavar="QUERY", help="fetch fresh result pages into fixtures/")
+    args = parser.parse_args()
+    if args.record:
+        asyncio.run(record(args.record))
+    else:
+        run(args.iterations)
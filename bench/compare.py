@@ -0,0 +1,40 @@
+import sys
+import json
+
+METRICS = ("total_ms", "first_response_ms", "first_answer_ms")
+
+
+def rows(report):
+    yield "throughput (req/s)", report["throughput"], True
+    yield "loop lag p99 (ms)", report["loop_lag_ms"]["p99"], False
+    yield "max rss (MB)", report["max_rss_mb"], False
+    for kind, stats in report["requests"].items():
+        for metric in METRICS:
+            for p in ("p50", "p95", "p99"):
+                yield f"{kind} {metric} {p}", stats[metric][p], False
+    for service, count in report["upstream_requests"].items():
+        yield f"upstream {service}", count, False
+
+
+def compare(base, head):
+    head_rows = {name: value for name, value, _ in rows(head)}
+    print(f"{'metric':<36} {base['label'] + '@' + str(base['commit']):>18} {head['label'] + '@' + str(head['commit']):>18} {'change':>9}")
+    for name, value, higher_is_better in rows(base):
+        new = head_rows.get(name)
+        if value is None or new is None:
+            continue
+        change = (new - value) / value * 100 if value else 0.0
+        better = change > 0 if higher_is_better else change < 0
+        mark = "" if abs(change) < 5 else ("✅" if better else "❌")
+        print(f"{name:<36} {value:>18.1f} {new:>18.1f} {change:>+8.1f}% {mark}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python bench/compare.py base.json head.json")
+        sys.exit(1)
+    with open(sys.argv[1], encoding="utf-8") as f:
+        base = json.load(f)
+    with open(sys.argv[2], encoding="utf-8") as f:
+        head = json.load(f)
+    compare(base, head)
@@ -0,0 +1,107 @@
+import time
+import random
+import asyncio
+from types import SimpleNamespace
+from pyrogram.enums import ChatMemberStatus
+from pyrogram.errors import UserIsBlocked
+
+
+class Recorder:
+    def __init__(self):
+        self.events = {}
+
+    def mark(self, request_id, name):
+        if request_id is None:
+            return
+        marks = self.events.setdefault(request_id, {})
+        marks.setdefault(name, time.perf_counter())
+
+
+class FakeMessage:
+    counter = 0
+
+    def __init__(self, client, text="", user_id=1, chat_id=None, request_id=None):
+        FakeMessage.counter += 1
+        self.client = client
+        self.id = FakeMessage.counter
+        self.text = text
+        self.caption = None
+        self.request_id = request_id
+        self.chat = SimpleNamespace(id=chat_id or user_id)
+        self.from_user = SimpleNamespace(id=user_id, username=f"user{user_id}", first_name="Bench")
+        self.command = text[1:].split() if text.startswith("/") else None
+
+    def child(self, text):
+        return FakeMessage(self.client, text, self.from_user.id, self.chat.id, self.request_id)
+
+    def record(self, text):
+        self.client.recorder.mark(self.request_id, "first_response")
+        if text and ("AI Javob" in text or text.startswith("📚")):
+            self.client.recorder.mark(self.request_id, "first_answer")
+
+    async def reply_text(self, text, **kwargs):
+        await self.client.api_call()
+        self.record(text)
+        return self.child(text)
+
+    async def reply_photo(self, photo, caption="", **kwargs):
+        await self.client.api_call()
+        if photo.startswith("http"):
+            await asyncio.sleep(self.client.photo_fetch_latency)
+        self.record(caption)
+        message = self.child("")
+        message.caption = caption
+        message.photo = SimpleNamespace(file_id=photo if not photo.startswith("http") else f"file-{abs(hash(photo))}")
+        return message
+
+    async def edit_text(self, text, **kwargs):
+        await self.client.api_call()
+        self.record(text)
+        self.text = text
+        return self
+
+    async def delete(self):
+        await self.client.api_call()
+
+
+class FakeCallbackQuery:
+    def __init__(self, client, data, user_id=1, request_id=None):
+        self.data = data
+        self.from_user = SimpleNamespace(id=user_id, username=f"user{user_id}", first_name="Bench")
+        self.message = FakeMessage(client, "👨‍💼 **Admin Panel**", user_id, request_id=request_id)
+        self.client = client
+        self.request_id = request_id
+
+    async def answer(self, text=None, show_alert=False):
+        await self.client.api_call()
+        self.client.recorder.mark(self.request_id, "first_response")
+
+
+class FakeClient:
+    def __init__(self, latency=0.03, blocked_rate=0.0, seed=1, photo_fetch_latency=0.4):
+        self.latency = latency
+        self.photo_fetch_latency = photo_fetch_latency
+        self.blocked_rate = blocked_rate
+        self.random = random.Random(seed)
+        self.recorder = Recorder()
+        self.calls = 0
+        self.sent = 0
+
+    async def api_call(self):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def get_chat_member(self, channel, user_id):
+        await self.api_call()
+        return SimpleNamespace(status=ChatMemberStatus.MEMBER)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await self.api_call()
+        if self.random.random() < self.blocked_rate:
+            raise UserIsBlocked()
+        self.sent += 1
+        return FakeMessage(self, text, chat_id)
+
+    async def edit_message_text(self, chat_id, message_id, text, **kwargs):
+        await self.api_call()
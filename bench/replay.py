@@ -0,0 +1,272 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import resource
+import tempfile
+import tracemalloc
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from stubs import StubServers, parse_service_values
+from fakes import FakeClient, FakeMessage, FakeCallbackQuery
+from cluster import owns
+
+ADMIN_ID = 1
+QUERIES = {
+    "uz": ["Amir Temur kim", "Samarqand tarixi", "Sun'iy intellekt nima", "Alisher Navoiy asarlari", "Ulug'bek rasadxonasi",
+           "Bobur kim", "Registon maydoni", "Ibn Sino", "Al-Xorazmiy", "Toshkent metrosi", "Orol dengizi", "Buxoro"],
+    "ru": ["Кто такой Тамерлан", "История Самарканда", "Что такое искусственный интеллект", "Алишер Навои"],
+    "en": ["Who was Timur", "History of Samarkand", "What is artificial intelligence", "Aral Sea"]
+}
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(p / 100 * (len(values) - 1)))))
+    return values[index]
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else None
+    }
+
+
+def generate_trace(path, requests, rate, users, seed):
+    rng = random.Random(seed)
+    at = 0.0
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(requests):
+            at += rng.expovariate(rate)
+            user = rng.randint(2, users + 1)
+            lang = rng.choices(["uz", "ru", "en"], [0.7, 0.2, 0.1])[0]
+            queries = QUERIES[lang]
+            text = queries[min(len(queries) - 1, int(rng.paretovariate(1.1)) - 1)]
+            if rng.random() < 0.3:
+                text = f"{text} {rng.randint(1, 500)}"
+            event = {"at": round(at, 4), "kind": "search", "user": user, "lang": lang, "text": text}
+            if rng.random() < 0.03:
+                event = {"at": round(at, 4), "kind": "callback", "user": ADMIN_ID, "data": rng.choice(["admin_stats", "admin_top_searches", "admin_top_day"])}
+            f.write(json.dumps(event, ensure_ascii=False) + "\n")
+    print(f"💾 {requests} events -> {path}")
+
+
+def load_trace(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+async def monitor_loop_lag(samples, interval=0.01):
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - started - interval) * 1000)
+
+
+async def dispatch(main, client, event, request_id, results):
+    started = time.perf_counter()
+    kind = event["kind"]
+    status = "ok"
+    try:
+        if kind == "search":
+            user_id = event["user"]
+            if event.get("lang"):
+                main.set_user_language(user_id, event["lang"])
+            message = FakeMessage(client, event["text"], user_id, request_id=request_id)
+            await main.search_handler(client, message)
+            task = main.scheduler.active.get(user_id)
+            if task is not None:
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    status = "superseded"
+        elif kind == "callback":
+            query = FakeCallbackQuery(client, event["data"], event["user"], request_id=request_id)
+            await main.callback_handler(client, query)
+        elif kind == "start":
+            message = FakeMessage(client, "/start", event["user"], request_id=request_id)
+            await main.start_command(client, message)
+        elif kind == "broadcast":
+            message = FakeMessage(client, f"/broadcast {event.get('text', 'Reklama')}", ADMIN_ID, request_id=request_id)
+            await main.broadcast(client, message)
+            if main.broadcaster.task is not None:
+                await main.broadcaster.task
+    except Exception as e:
+        status = f"error: {e}"
+    finished = time.perf_counter()
+    marks = client.recorder.events.get(request_id, {})
+    results.append({
+        "kind": kind,
+        "status": status,
+        "total": (finished - started) * 1000,
+        "first_response": (marks["first_response"] - started) * 1000 if "first_response" in marks else None,
+        "first_answer": (marks["first_answer"] - started) * 1000 if "first_answer" in marks else None
+    })
+
+
+async def replay(args):
+    workdir = tempfile.mkdtemp(prefix="wikibot-bench-")
+    os.chdir(workdir)
+    stubs = StubServers(
+        latency=parse_service_values(args.latency, args.default_latency),
+        errors=parse_service_values(args.errors, 0.0),
+        groq_chars_per_second=args.groq_speed
+    )
+    urls = await stubs.start()
+    os.environ.update(urls)
+    os.environ.update({
+        "API_ID": "1",
+        "API_HASH": "bench",
+        "BOT_TOKEN": "1:bench",
+        "ADMIN_ID": str(ADMIN_ID),
+        "GROQ_API_KEY": "bench",
+        "DB_FILE": os.path.join(workdir, "bot.db"),
+        "CACHE_DB_FILE": ""
+    })
+    for item in args.env or []:
+        name, value = item.split("=", 1)
+        os.environ[name] = value
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    import main
+
+    client = FakeClient(latency=args.telegram_latency, blocked_rate=args.blocked_rate)
+    main.app.get_chat_member = client.get_chat_member
+    main.broadcaster.client = client
+    for user_id in range(2, args.seed_users + 2):
+        main.add_user(user_id, f"user{user_id}", "Bench")
+    main.store.flush()
+
+    trace = load_trace(args.trace)
+    lag_samples = []
+    lag_task = asyncio.create_task(monitor_loop_lag(lag_samples))
+    flusher = asyncio.create_task(main.store.run_flusher())
+    hydration = asyncio.create_task(main.users.hydrate())
+    warming = asyncio.create_task(main.warmer.run()) if main.WARM_ENABLED else None
+    results = []
+    tasks = []
+    started = time.perf_counter()
+    for request_id, event in enumerate(trace):
+        if not owns(event.get("user", ADMIN_ID), main.WORKER_INDEX, main.WORKER_COUNT):
+            continue
+        delay = event.get("at", 0) / args.speed - (time.perf_counter() - started)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(dispatch(main, client, event, request_id, results)))
+    await asyncio.gather(*tasks)
+    wall = time.perf_counter() - started
+    lag_task.cancel()
+    flusher.cancel()
+    hydration.cancel()
+    if warming:
+        warming.cancel()
+
+    report = {
+        "label": args.label,
+        "commit": git_commit(),
+        "trace": os.path.basename(args.trace),
+        "config": {
+            "speed": args.speed,
+            "telegram_latency": args.telegram_latency,
+            "latency": stubs.latency,
+            "errors": stubs.errors,
+            "env": args.env or []
+        },
+        "wall_seconds": wall,
+        "throughput": len(results) / wall if wall else None,
+        "requests": {},
+        "loop_lag_ms": summarize(lag_samples),
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "upstream_requests": stubs.requests,
+        "upstream_failures": stubs.failures,
+        "telegram_calls": client.calls,
+        "warm": {"runs": main.warmer.runs, "hits": main.warmer.hits, "paused": main.warmer.paused}
+    }
+    if args.tracemalloc:
+        report["python_peak_mb"] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    for kind in sorted({result["kind"] for result in results}):
+        subset = [result for result in results if result["kind"] == kind]
+        report["requests"][kind] = {
+            "total_ms": summarize([r["total"] for r in subset if r["status"] == "ok"]),
+            "first_response_ms": summarize([r["first_response"] for r in subset if r["first_response"] is not None]),
+            "first_answer_ms": summarize([r["first_answer"] for r in subset if r["first_answer"] is not None]),
+            "statuses": {status: sum(1 for r in subset if r["status"] == status) for status in {r["status"] for r in subset}}
+        }
+
+    await main.http.close()
+    await stubs.stop()
+    return report
+
+
+def print_report(report):
+    print(f"\n📊 {report['label']} @ {report['commit']}  ({report['trace']})")
+    print(f"  wall {report['wall_seconds']:.2f}s  throughput {report['throughput']:.1f} req/s  rss {report['max_rss_mb']:.0f} MB")
+    lag = report["loop_lag_ms"]
+    print(f"  loop lag p50 {lag['p50']:.2f} ms  p99 {lag['p99']:.2f} ms  max {lag['max']:.2f} ms")
+    for kind, stats in report["requests"].items():
+        print(f"  {kind}: {stats['statuses']}")
+        for metric in ("total_ms", "first_response_ms", "first_answer_ms"):
+            values = stats[metric]
+            if values["count"]:
+                print(f"    {metric:<18} p50 {values['p50']:8.1f}  p95 {values['p95']:8.1f}  p99 {values['p99']:8.1f}")
+    print(f"  upstream {report['upstream_requests']}")
+    print(f"  warm {report['warm']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a query trace against the bot with local stand-ins for every external service")
+    parser.add_argument("--trace", default=os.path.join(BENCH_DIR, "traces", "sample.jsonl"))
+    parser.add_argument("--generate", type=int, metavar="N", help="write a synthetic trace of N events to --trace and exit")
+    parser.add_argument("--rate", type=float, default=20, help="events per second for --generate")
+    parser.add_argument("--users", type=int, default=200, help="distinct users for --generate")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--speed", type=float, default=1.0, help="trace time compression factor")
+    parser.add_argument("--default-latency", type=float, default=0.2)
+    parser.add_argument("--latency", action="append", metavar="SERVICE=SECONDS")
+    parser.add_argument("--errors", action="append", metavar="SERVICE=RATE")
+    parser.add_argument("--groq-speed", type=float, default=2000, help="streamed answer characters per second")
+    parser.add_argument("--telegram-latency", type=float, default=0.03)
+    parser.add_argument("--blocked-rate", type=float, default=0.02)
+    parser.add_argument("--seed-users", type=int, default=0, help="users to create before replay (for broadcast events)")
+    parser.add_argument("--env", action="append", metavar="NAME=VALUE", help="extra bot settings, e.g. SEARCH_CONCURRENCY=50")
+    parser.add_argument("--tracemalloc", action="store_true")
+    args = parser.parse_args()
+    args.trace = os.path.abspath(args.trace)
+    if args.out:
+        args.out = os.path.abspath(args.out)
+
+    if args.generate:
+        generate_trace(args.trace, args.generate, args.rate, args.users, args.seed)
+        sys.exit(0)
+
+    report = asyncio.run(replay(args))
+    print_report(report)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 {args.out}")
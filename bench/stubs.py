@@ -0,0 +1,145 @@
+import os
+import json
+import random
+import asyncio
+from aiohttp import web
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+SERVICES = ("google", "bing", "duckduckgo", "wikipedia", "groq", "images")
+IMAGE_HOST = "https://upload.wikimedia.org"
+
+
+def parse_service_values(items, default):
+    values = {service: default for service in SERVICES}
+    for item in items or []:
+        service, value = item.split("=", 1)
+        values[service] = float(value)
+    return values
+
+
+class StubServers:
+    def __init__(self, latency=None, jitter=0.25, errors=None, groq_chars_per_second=400, seed=1):
+        self.latency = latency or parse_service_values(None, 0.0)
+        self.jitter = jitter
+        self.errors = errors or parse_service_values(None, 0.0)
+        self.groq_chars_per_second = groq_chars_per_second
+        self.random = random.Random(seed)
+        self.requests = {service: 0 for service in SERVICES}
+        self.failures = {service: 0 for service in SERVICES}
+        self.runner = None
+        self.port = None
+        with open(os.path.join(FIXTURES, "google.html"), encoding="utf-8") as f:
+            self.google_html = f.read()
+        with open(os.path.join(FIXTURES, "bing.html"), encoding="utf-8") as f:
+            self.bing_html = f.read()
+        with open(os.path.join(FIXTURES, "duckduckgo.json"), encoding="utf-8") as f:
+            self.duckduckgo_data = json.load(f)
+        with open(os.path.join(FIXTURES, "wikipedia.json"), encoding="utf-8") as f:
+            self.wikipedia_data = json.load(f)
+        with open(os.path.join(FIXTURES, "groq_answer.txt"), encoding="utf-8") as f:
+            self.groq_answer = f.read()
+
+    def urls(self):
+        base = f"http://127.0.0.1:{self.port}"
+        return {
+            "GOOGLE_SEARCH_URL": f"{base}/google/search",
+            "BING_SEARCH_URL": f"{base}/bing/search",
+            "DUCKDUCKGO_API_URL": f"{base}/duckduckgo/",
+            "WIKIPEDIA_API_URL": base + "/wikipedia/{lang}/w/api.php",
+            "GROQ_API_URL": f"{base}/groq/v1/chat/completions"
+        }
+
+    async def delay(self, service):
+        self.requests[service] += 1
+        latency = self.latency[service]
+        if latency:
+            await asyncio.sleep(max(0, self.random.gauss(latency, latency * self.jitter)))
+        if self.random.random() < self.errors[service]:
+            self.failures[service] += 1
+            raise web.HTTPServiceUnavailable()
+
+    async def google(self, request):
+        await self.delay("google")
+        return web.Response(text=self.google_html, content_type="text/html")
+
+    async def bing(self, request):
+        await self.delay("bing")
+        return web.Response(text=self.bing_html, content_type="text/html")
+
+    async def duckduckgo(self, request):
+        await self.delay("duckduckgo")
+        data = dict(self.duckduckgo_data, Heading=request.query.get("q", ""))
+        return web.Response(text=json.dumps(data), content_type="application/x-javascript")
+
+    async def wikipedia(self, request):
+        await self.delay("wikipedia")
+        query = request.query.get("gsrsearch") or request.query.get("titles", "")
+        pages = []
+        for i, page in enumerate(self.wikipedia_data["pages"], 1):
+            page = dict(page, title=f"{query} {i}".strip(), index=i)
+            if "original" in page:
+                source = page["original"]["source"].replace(IMAGE_HOST, f"http://127.0.0.1:{self.port}/images")
+                page["original"] = dict(page["original"], source=source)
+            pages.append(page)
+        return web.json_response({"query": {"pages": pages}})
+
+    async def images(self, request):
+        await self.delay("images")
+        return web.Response(body=b"\xff\xd8\xff\xe0" + b"\0" * 2048, content_type="image/jpeg")
+
+    async def groq(self, request):
+        await self.delay("groq")
+        payload = await request.json()
+        if not payload.get("stream"):
+            await asyncio.sleep(len(self.groq_answer) / self.groq_chars_per_second)
+            return web.json_response({"choices": [{"message": {"content": self.groq_answer}}]})
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        words = self.groq_answer.split(" ")
+        per_word = len(self.groq_answer) / self.groq_chars_per_second / len(words)
+        for word in words:
+            chunk = {"choices": [{"delta": {"content": word + " "}}]}
+            await response.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode())
+            await asyncio.sleep(per_word)
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    async def start(self, port=0):
+        application = web.Application()
+        application.router.add_get("/google/search", self.google)
+        application.router.add_get("/bing/search", self.bing)
+        application.router.add_get("/duckduckgo/", self.duckduckgo)
+        application.router.add_get("/wikipedia/{lang}/w/api.php", self.wikipedia)
+        application.router.add_get("/images/{path:.*}", self.images)
+        application.router.add_post("/groq/v1/chat/completions", self.groq)
+        self.runner = web.AppRunner(application, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self.urls()
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+
+async def serve(args):
+    stubs = StubServers(
+        latency=parse_service_values(args.latency, args.default_latency),
+        errors=parse_service_values(args.errors, 0.0)
+    )
+    urls = await stubs.start(args.port)
+    for name, url in urls.items():
+        print(f"{name}={url}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Local stand-ins for Google, Bing, DuckDuckGo, Wikipedia and Groq")
+    parser.add_argument("--port", type=int, default=8780)
+    parser.add_argument("--default-latency", type=float, default=0.2)
+    parser.add_argument("--latency", action="append", metavar="SERVICE=SECONDS")
+    parser.add_argument("--errors", action="append", metavar="SERVICE=RATE")
+    asyncio.run(serve(parser.parse_args()))
@@ -0,0 +1,195 @@
+import time
+import asyncio
+import logging
+from pyrogram.errors import FloodWait, UserIsBlocked, InputUserDeactivated, UserDeactivated, UserDeactivatedBan, RPCError
+
+logger = logging.getLogger(__name__)
+
+JOB_KEY = "broadcast_job"
+GONE_ERRORS = (UserIsBlocked, InputUserDeactivated, UserDeactivated, UserDeactivatedBan)
+
+
+class LeaseLost(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0
+        self.lock = asyncio.Lock()
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class Broadcaster:
+    def __init__(self, client, storage, users, prune_user, rate=30, workers=20, batch_size=500, progress_interval=5, owner="main", lease=60):
+        self.client = client
+        self.storage = storage
+        self.users = users
+        self.prune_user = prune_user
+        self.bucket = TokenBucket(rate)
+        self.workers = workers
+        self.batch_size = batch_size
+        self.progress_interval = progress_interval
+        self.owner = owner
+        self.lease = lease
+        self.renewed = 0
+        self.task = None
+
+    def running(self):
+        if self.task is not None and not self.task.done():
+            return True
+        job = self.storage.get_value(JOB_KEY)
+        return bool(job) and job.get("owner") != self.owner and time.time() - job.get("heartbeat", 0) < self.lease
+
+    def save(self, job):
+        job["heartbeat"] = time.time()
+        if not self.storage.update_owned(JOB_KEY, self.owner, job):
+            raise LeaseLost()
+        self.renewed = time.monotonic()
+
+    def leased(self):
+        return time.monotonic() - self.renewed < self.lease
+
+    def abandon(self):
+        if self.task is not None and not self.task.done():
+            logger.warning("Broadcast lease lost, stopping")
+            self.task.cancel()
+
+    async def keep_alive(self, job):
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                self.save(job)
+            except LeaseLost:
+                self.abandon()
+                return
+
+    def start(self, text, chat_id, status_message_id):
+        job = {
+            "text": text,
+            "chat_id": chat_id,
+            "status_message_id": status_message_id,
+            "cursor": 0,
+            "success": 0,
+            "failed": 0,
+            "pruned": 0,
+            "owner": self.owner,
+            "heartbeat": time.time()
+        }
+        self.storage.set_value(JOB_KEY, job)
+        self.storage.flush()
+        self.renewed = time.monotonic()
+        self.launch(job)
+
+    def resume(self):
+        if self.task is not None and not self.task.done():
+            return False
+        job = self.storage.claim_value(JOB_KEY, self.owner, self.lease)
+        if job:
+            logger.info(f"Resuming broadcast from user {job['cursor']}")
+            self.renewed = time.monotonic()
+            self.launch(job)
+            return True
+        return False
+
+    def launch(self, job):
+        self.task = asyncio.create_task(self.run(job))
+        self.task.add_done_callback(self.finished)
+
+    def finished(self, task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Broadcast stopped", exc_info=task.exception())
+
+    async def send(self, user_id, job):
+        for _ in range(3):
+            await self.bucket.acquire()
+            if not self.leased():
+                self.abandon()
+                return
+            try:
+                await self.client.send_message(user_id, job["text"])
+                job["success"] += 1
+                return
+            except FloodWait as e:
+                logger.warning(f"Broadcast FloodWait {e.value}s")
+                self.bucket.pause(e.value)
+            except GONE_ERRORS:
+                self.prune_user(user_id)
+                job["pruned"] += 1
+                return
+            except RPCError as e:
+                logger.error(f"Broadcast error ({user_id}): {e}")
+                break
+            except Exception as e:
+                logger.error(f"Broadcast send failed ({user_id}): {e!r}")
+                break
+        job["failed"] += 1
+
+    async def worker(self, queue, job):
+        while True:
+            user_id = await queue.get()
+            try:
+                await self.send(user_id, job)
+            finally:
+                queue.task_done()
+
+    def progress_text(self, job, done=False):
+        head = "✅ Tugadi" if done else "📤 Yuborilmoqda..."
+        return f"{head}\n\n✅ Yuborildi: {job['success']}\n❌ Xato: {job['failed']}\n🚫 Bloklagan: {job['pruned']}"
+
+    async def report(self, job, done=False):
+        try:
+            await self.client.edit_message_text(job["chat_id"], job["status_message_id"], self.progress_text(job, done))
+        except FloodWait as e:
+            await asyncio.sleep(e.value)
+        except RPCError:
+            pass
+
+    async def run(self, job):
+        queue = asyncio.Queue(maxsize=self.workers * 2)
+        workers = [asyncio.create_task(self.worker(queue, job)) for _ in range(self.workers)]
+        workers.append(asyncio.create_task(self.keep_alive(job)))
+        last_report = time.monotonic()
+        try:
+            while True:
+                user_ids = self.users.iter_ids(job["cursor"], self.batch_size)
+                if not user_ids:
+                    break
+                for user_id in user_ids:
+                    await queue.put(user_id)
+                    if time.monotonic() - last_report >= self.progress_interval:
+                        last_report = time.monotonic()
+                        self.save(job)
+                        await self.report(job)
+                await queue.join()
+                job["cursor"] = user_ids[-1]
+                self.save(job)
+            self.storage.delete_value(JOB_KEY)
+            self.storage.flush()
+            await self.report(job, done=True)
+        except LeaseLost:
+            logger.warning("Broadcast lease lost, stopping")
+        finally:
+            for task in workers:
+                task.cancel()
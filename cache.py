@@ -0,0 +1,179 @@
+import re
+import json
+import asyncio
+import time
+import sqlite3
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_query(query):
+    query = unicodedata.normalize("NFKC", query).lower()
+    query = re.sub(r"\s+", " ", query)
+    return query.strip(" ?!.,;:\"'")
+
+
+class DiskCache:
+    def __init__(self, path, max_rows=100000, purge_every=1000):
+        self.max_rows = max_rows
+        self.purge_every = purge_every
+        self.writes = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (namespace TEXT, key TEXT, value TEXT, expires REAL, PRIMARY KEY (namespace, key))"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)")
+        self.purge()
+
+    def purge(self):
+        self.conn.execute("DELETE FROM cache WHERE expires < ?", (time.time(),))
+        excess = self.conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.max_rows
+        if excess > 0:
+            self.conn.execute(
+                "DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache ORDER BY expires LIMIT ?)", (excess,)
+            )
+        self.conn.commit()
+        self.writes = 0
+
+    def get(self, namespace, key):
+        row = self.conn.execute(
+            "SELECT value, expires FROM cache WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        if row is None:
+            return None, 0
+        if row[1] < time.time():
+            return None, 0
+        return json.loads(row[0]), row[1]
+
+    def set(self, namespace, key, value, expires):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO cache (namespace, key, value, expires) VALUES (?, ?, ?, ?)",
+            (namespace, key, json.dumps(value, ensure_ascii=False), expires)
+        )
+        self.conn.commit()
+        self.writes += 1
+        if self.writes >= self.purge_every:
+            self.purge()
+
+    def close(self):
+        self.conn.close()
+
+
+class TieredCache:
+    def __init__(self, name, max_bytes, default_ttl, disk=None):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.disk = disk
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def cached(self, key):
+        entry = self.entries.get(key)
+        return entry is not None and entry[0] >= time.time()
+
+    def expires_in(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            return max(0, entry[0] - time.time())
+        if self.disk is not None:
+            value, expires = self.disk.get(self.name, key)
+            if value is not None:
+                return max(0, expires - time.time())
+        return 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            expires, size, value = entry
+            if expires >= time.time():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self.remove(key)
+        if self.disk is not None:
+            value, expires = self.disk.get(self.name, key)
+            if value is not None:
+                self.store(key, value, expires)
+                self.disk_hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def set(self, key, value, ttl=None):
+        expires = time.time() + (ttl or self.default_ttl)
+        self.store(key, value, expires)
+        if self.disk is not None:
+            self.disk.set(self.name, key, value, expires)
+
+    def store(self, key, value, expires):
+        size = len(key) + len(json.dumps(value, ensure_ascii=False))
+        if size > self.max_bytes:
+            return
+        self.remove(key)
+        self.entries[key] = (expires, size, value)
+        self.size += size
+        while self.size > self.max_bytes:
+            old_key = next(iter(self.entries))
+            self.remove(old_key)
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses
+        }
+
+
+class Flight:
+    def __init__(self):
+        self.listeners = []
+        self.events = {}
+        self.task = None
+
+    def join(self, listener):
+        self.listeners.append(listener)
+        for event, value in self.events.items():
+            listener(event, value)
+
+    def emit(self, event, value=None):
+        self.events[event] = value
+        for listener in self.listeners:
+            listener(event, value)
+
+
+class SingleFlight:
+    def __init__(self):
+        self.flights = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def run(self, key, func, listener=None):
+        flight = self.flights.get(key)
+        if flight is None:
+            flight = Flight()
+            self.flights[key] = flight
+            flight.task = asyncio.create_task(func(flight.emit))
+            flight.task.add_done_callback(lambda _: self.flights.pop(key, None))
+            self.started += 1
+        else:
+            self.coalesced += 1
+        if listener is not None:
+            flight.join(listener)
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            if listener in flight.listeners:
+                flight.listeners.remove(listener)
@@ -0,0 +1,135 @@
+import os
+import sys
+import time
+import heapq
+import signal
+import asyncio
+import logging
+import subprocess
+from pyrogram import filters
+
+logger = logging.getLogger(__name__)
+
+CHANNELS_VERSION_KEY = "channels_version"
+ANALYTICS_KEY = "analytics:"
+WARM_KEY = "warm:"
+
+
+def update_user_id(update):
+    member = getattr(update, "new_chat_member", None) or getattr(update, "old_chat_member", None)
+    if member is not None and member.user:
+        return member.user.id
+    user = getattr(update, "from_user", None)
+    return user.id if user else None
+
+
+def owns(user_id, index, count):
+    if user_id is None:
+        return index == 0
+    return user_id % count == index
+
+
+def partition_filter(index, count):
+    return filters.create(lambda _, __, update: owns(update_user_id(update), index, count), "PartitionFilter")
+
+
+def merge_snapshots(snapshots, k=10):
+    top = {}
+    windows = {}
+    for snapshot in snapshots:
+        for query, count in snapshot["top"]:
+            top[query] = max(top.get(query, 0), count)
+        for name, window in snapshot["windows"].items():
+            merged = windows.setdefault(name, {"total": 0, "counts": {}})
+            merged["total"] += window["total"]
+            for query, count in window["top"]:
+                merged["counts"][query] = merged["counts"].get(query, 0) + count
+    return {
+        "top": heapq.nlargest(k, top.items(), key=lambda item: item[1]),
+        "windows": {
+            name: {"total": window["total"], "top": heapq.nlargest(k, window["counts"].items(), key=lambda item: item[1])}
+            for name, window in windows.items()
+        }
+    }
+
+
+class ClusterSync:
+    def __init__(self, storage, index, on_channels, analytics, broadcaster, interval=2, publish_every=5, snapshots=None):
+        self.storage = storage
+        self.index = index
+        self.on_channels = on_channels
+        self.analytics = analytics
+        self.broadcaster = broadcaster
+        self.interval = interval
+        self.publish_every = publish_every
+        self.snapshots = snapshots or {}
+        self.channels_version = storage.get_value(CHANNELS_VERSION_KEY, 0)
+
+    def bump_channels(self):
+        self.channels_version = time.time()
+        self.storage.set_value(CHANNELS_VERSION_KEY, self.channels_version)
+        self.storage.flush()
+
+    def publish(self):
+        self.storage.set_value(f"{ANALYTICS_KEY}{self.index}", self.analytics.snapshot(50))
+        for prefix, snapshot in self.snapshots.items():
+            self.storage.set_value(f"{prefix}{self.index}", snapshot())
+        self.storage.flush()
+
+    def peers(self, prefix):
+        return [value for key, value in self.storage.get_values(prefix).items() if key != f"{prefix}{self.index}"]
+
+    def view(self):
+        self.publish()
+        return merge_snapshots(self.storage.get_values(ANALYTICS_KEY).values())
+
+    def tick(self, step):
+        version = self.storage.get_value(CHANNELS_VERSION_KEY, 0)
+        if version != self.channels_version:
+            self.channels_version = version
+            self.on_channels(self.storage.load()["channels"])
+        if step % self.publish_every == 0:
+            self.publish()
+        self.broadcaster.resume()
+
+    async def run(self):
+        step = 0
+        while True:
+            await asyncio.sleep(self.interval)
+            step += 1
+            try:
+                self.tick(step)
+            except Exception as e:
+                logger.error(f"Cluster sync error: {e}")
+
+
+def launch(count, script="main.py"):
+    processes = {}
+
+    def spawn(index):
+        env = dict(os.environ, WORKER_INDEX=str(index), WORKER_COUNT=str(count))
+        return subprocess.Popen([sys.executable, script], env=env)
+
+    def stop(signum, frame):
+        for process in processes.values():
+            process.send_signal(signal.SIGINT)
+        for process in processes.values():
+            process.wait()
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for index in range(count):
+        processes[index] = spawn(index)
+    print(f"🚀 {count} ta worker ishga tushdi")
+    while True:
+        time.sleep(1)
+        for index, process in list(processes.items()):
+            if process.poll() is not None:
+                print(f"⚠️ Worker {index} to'xtadi (kod {process.returncode}), qayta ishga tushirilmoqda")
+                time.sleep(1)
+                processes[index] = spawn(index)
+
+
+if __name__ == "__main__":
+    launch(int(sys.argv[1]) if len(sys.argv) > 1 else int(os.getenv("WORKERS", "2")))
@@ -0,0 +1,113 @@
+import re
+import math
+
+WORD = re.compile(r"\w+", re.UNICODE)
+
+SOURCE_WEIGHTS = {
+    "Wikipedia": 1.3,
+    "LocalWiki": 1.3,
+    "DuckDuckGo": 1.1,
+    "Google": 1.0,
+    "Bing": 0.9
+}
+CHARS_PER_TOKEN = {
+    "uz": 2.6,
+    "ru": 3.2,
+    "en": 4.0
+}
+
+
+def tokenize(text):
+    return WORD.findall(text.lower())
+
+
+def shingles(tokens, size=3):
+    if len(tokens) < size:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def estimate_tokens(text, language="uz"):
+    return int(len(text) / CHARS_PER_TOKEN.get(language, 3.0)) + 1
+
+
+def is_duplicate(a, b, threshold):
+    if not a or not b:
+        return False
+    overlap = len(a & b)
+    return overlap / min(len(a), len(b)) >= threshold
+
+
+def score_snippets(query, snippets):
+    query_terms = set(tokenize(query))
+    documents = [tokenize(f"{s.get('title', '')} {s.get('content', '')}") for s in snippets]
+    average = sum(len(d) for d in documents) / len(documents) if documents else 0
+    scores = []
+    for position, (snippet, terms) in enumerate(zip(snippets, documents)):
+        frequencies = {}
+        for term in terms:
+            if term in query_terms:
+                frequencies[term] = frequencies.get(term, 0) + 1
+        score = 0.0
+        for term, frequency in frequencies.items():
+            containing = sum(1 for d in documents if term in d)
+            idf = math.log(1 + (len(documents) - containing + 0.5) / (containing + 0.5))
+            score += idf * frequency * 2.2 / (frequency + 1.2 * (0.25 + 0.75 * len(terms) / (average or 1)))
+        title_terms = set(tokenize(snippet.get("title", "")))
+        score += 0.5 * len(title_terms & query_terms)
+        score = (score + 1) * SOURCE_WEIGHTS.get(snippet.get("source"), 1.0) / (1 + position * 0.02)
+        scores.append(score)
+    return scores
+
+
+def format_snippet(index, snippet, content):
+    text = f"\n\n--- Manba {index} ({snippet['source']}) ---\n"
+    text += f"Sarlavha: {snippet.get('title', 'N/A')}\n"
+    text += f"Ma'lumot: {content}\n"
+    if snippet.get('url'):
+        text += f"Havola: {snippet['url']}\n"
+    return text
+
+
+def trim(text, limit):
+    if len(text) <= limit:
+        return text
+    cut = max(text.rfind(". ", 0, limit), text.rfind("\n", 0, limit))
+    if cut < limit // 2:
+        cut = text.rfind(" ", 0, limit)
+    return text[:cut + 1 if cut > 0 else limit].rstrip()
+
+
+def build_context(query, snippets, language="uz", token_budget=1500, snippet_chars=500, max_snippets=10, duplicate_threshold=0.6):
+    candidates = [s for s in snippets if s.get("content")]
+    scores = score_snippets(query, candidates)
+    ranked = sorted(zip(scores, range(len(candidates))), key=lambda item: (-item[0], item[1]))
+
+    chosen = []
+    chosen_shingles = []
+    for score, index in ranked:
+        snippet = candidates[index]
+        fingerprint = shingles(tokenize(snippet["content"][:snippet_chars * 2]))
+        if any(is_duplicate(fingerprint, other, duplicate_threshold) for other in chosen_shingles):
+            continue
+        chosen.append(snippet)
+        chosen_shingles.append(fingerprint)
+        if len(chosen) >= max_snippets:
+            break
+
+    context = ""
+    used = 0
+    for number, snippet in enumerate(chosen, 1):
+        content = trim(snippet["content"], snippet_chars)
+        block = format_snippet(number, snippet, content)
+        cost = estimate_tokens(block, language)
+        if used + cost > token_budget:
+            overhead = estimate_tokens(format_snippet(number, snippet, ""), language)
+            remaining_chars = int((token_budget - used - overhead) * CHARS_PER_TOKEN.get(language, 3.0))
+            if remaining_chars < 120:
+                break
+            block = format_snippet(number, snippet, trim(content, remaining_chars))
+            cost = estimate_tokens(block, language)
+        context += block
+        used += cost
+    return context
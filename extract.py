@@ -0,0 +1,138 @@
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml.html
+    PARSER = "lxml"
+except ImportError:
+    PARSER = "html.parser"
+
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", "4"))
+
+executor = ThreadPoolExecutor(max_workers=EXTRACT_WORKERS, thread_name_prefix="extract")
+
+
+def has_class(name):
+    return f'contains(concat(" ", normalize-space(@class), " "), " {name} ")'
+
+
+GOOGLE_RESULTS = f'//div[{has_class("g")}]'
+GOOGLE_DESCRIPTION = f'.//div[{has_class("VwiC3b")}]'
+GOOGLE_FALLBACK = f'//div[{has_class("BNeawe")}]'
+BING_RESULTS = f'//li[{has_class("b_algo")}]'
+
+
+def class_matcher(*names):
+    def match(value):
+        if not value:
+            return False
+        tokens = value.split() if isinstance(value, str) else value
+        return any(name in tokens for name in names)
+    return match
+
+
+def first(node, path):
+    found = node.xpath(path)
+    return found[0] if found else None
+
+
+def google_lxml(html):
+    results = []
+    doc = lxml.html.fromstring(html)
+    for g in doc.xpath(GOOGLE_RESULTS):
+        title = first(g, ".//h3")
+        description = first(g, GOOGLE_DESCRIPTION)
+        link = first(g, ".//a")
+        if title is not None and description is not None and link is not None:
+            results.append({
+                "source": "Google",
+                "title": title.text_content(),
+                "content": description.text_content(),
+                "url": link.get("href", "")
+            })
+    if not results:
+        for i, div in enumerate(doc.xpath(GOOGLE_FALLBACK)[:5]):
+            results.append({
+                "source": "Google",
+                "title": f"Natija {i+1}",
+                "content": div.text_content()
+            })
+    return results
+
+
+def bing_lxml(html):
+    results = []
+    doc = lxml.html.fromstring(html)
+    for result in doc.xpath(BING_RESULTS)[:3]:
+        title = first(result, ".//h2")
+        desc = first(result, ".//p")
+        link = first(result, ".//a")
+        if title is not None and desc is not None:
+            results.append({
+                "source": "Bing",
+                "title": title.text_content(),
+                "content": desc.text_content(),
+                "url": link.get("href", "") if link is not None else ""
+            })
+    return results
+
+
+def google_soup(html):
+    results = []
+    only_results = SoupStrainer("div", attrs={"class": class_matcher("g", "BNeawe")})
+    soup = BeautifulSoup(html, "html.parser", parse_only=only_results)
+    for g in soup.find_all("div", class_="g"):
+        title = g.find("h3")
+        description = g.find("div", class_="VwiC3b")
+        link = g.find("a")
+        if title and description and link:
+            results.append({
+                "source": "Google",
+                "title": title.get_text(),
+                "content": description.get_text(),
+                "url": link.get("href", "")
+            })
+    if not results:
+        for i, div in enumerate(soup.find_all("div", class_="BNeawe")[:5]):
+            results.append({
+                "source": "Google",
+                "title": f"Natija {i+1}",
+                "content": div.get_text()
+            })
+    return results
+
+
+def bing_soup(html):
+    results = []
+    soup = BeautifulSoup(html, "html.parser", parse_only=SoupStrainer("li", attrs={"class": class_matcher("b_algo")}))
+    for result in soup.find_all("li", class_="b_algo")[:3]:
+        title = result.find("h2")
+        desc = result.find("p")
+        link = result.find("a")
+        if title and desc:
+            results.append({
+                "source": "Bing",
+                "title": title.get_text(),
+                "content": desc.get_text(),
+                "url": link.get("href", "") if link else ""
+            })
+    return results
+
+
+EXTRACTORS = {
+    "lxml": {"google": google_lxml, "bing": bing_lxml},
+    "html.parser": {"google": google_soup, "bing": bing_soup}
+}
+
+
+def extract(engine, html):
+    if not html:
+        return []
+    return EXTRACTORS[PARSER][engine](html)
+
+
+async def extract_async(engine, html):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, extract, engine, html)
@@ -0,0 +1,102 @@
+import os
+import json
+import asyncio
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+import aiohttp
+
+try:
+    import aiodns
+    HAS_AIODNS = True
+except ImportError:
+    HAS_AIODNS = False
+
+
+def parse_host_limits(value):
+    limits = {}
+    for item in (value or "").split(","):
+        if "=" not in item:
+            continue
+        host, limit = item.split("=", 1)
+        limits[host.strip()] = int(limit)
+    return limits
+
+
+class Response:
+    __slots__ = ("status", "headers", "body", "url", "charset")
+
+    def __init__(self, status, headers, body, url, charset=None):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.url = url
+        self.charset = charset
+
+    def text(self):
+        return self.body.decode(self.charset or "utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class HttpPool:
+    def __init__(self, limit=100, limit_per_host=20, dns_ttl=300, keepalive=30, host_limits=None):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_ttl = dns_ttl
+        self.keepalive = keepalive
+        self.host_limits = host_limits or {}
+        self.semaphores = {}
+        self.session = None
+
+    def get_session(self):
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_ttl,
+                keepalive_timeout=self.keepalive,
+                resolver=aiohttp.AsyncResolver() if HAS_AIODNS else None
+            )
+            self.session = aiohttp.ClientSession(connector=connector)
+        return self.session
+
+    def get_semaphore(self, host):
+        if host not in self.semaphores:
+            self.semaphores[host] = asyncio.Semaphore(self.host_limits.get(host, self.limit_per_host))
+        return self.semaphores[host]
+
+    @asynccontextmanager
+    async def stream(self, method, url, timeout=10, **kwargs):
+        session = self.get_session()
+        async with self.get_semaphore(urlsplit(url).hostname):
+            async with session.request(method, url, timeout=aiohttp.ClientTimeout(total=timeout), **kwargs) as response:
+                yield response
+
+    async def request(self, method, url, timeout=10, **kwargs):
+        async with self.stream(method, url, timeout=timeout, **kwargs) as response:
+            body = await response.read()
+            return Response(response.status, response.headers, body, str(response.url), response.charset)
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def head(self, url, **kwargs):
+        return await self.request("HEAD", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+
+def pool_from_env():
+    return HttpPool(
+        limit=int(os.getenv("HTTP_LIMIT", "100")),
+        limit_per_host=int(os.getenv("HTTP_LIMIT_PER_HOST", "20")),
+        dns_ttl=int(os.getenv("HTTP_DNS_TTL", "300")),
+        keepalive=int(os.getenv("HTTP_KEEPALIVE", "30")),
+        host_limits=parse_host_limits(os.getenv("HTTP_HOST_LIMITS", ""))
+    )
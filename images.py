@@ -0,0 +1,129 @@
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from urllib.parse import urlsplit
+from metrics import span
+
+logger = logging.getLogger(__name__)
+
+PHOTO_TYPES = {"image/jpeg", "image/png", "image/webp"}
+PHOTO_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+MAX_PHOTO_BYTES = 5 * 1024 * 1024
+MAX_ORIGINAL_SIDE = 2560
+MIN_PHOTO_SIDE = 100
+
+
+def as_image(image):
+    return {"url": image} if isinstance(image, str) else image
+
+
+def suitable(image):
+    if not urlsplit(image["url"]).path.lower().endswith(PHOTO_EXTENSIONS):
+        return False
+    width = image.get("width")
+    height = image.get("height")
+    if width and height:
+        if min(width, height) < MIN_PHOTO_SIDE or width + height > 10000 or max(width, height) / min(width, height) > 20:
+            return False
+    return True
+
+
+def lead_images(results):
+    seen = set()
+    candidates = []
+    for result in results:
+        images = [as_image(image) for image in result.get("images") or []]
+        for image in images:
+            if image.get("kind") == "original" and max(image.get("width") or 0, image.get("height") or 0) > MAX_ORIGINAL_SIDE:
+                continue
+            if image["url"] in seen or not suitable(image):
+                continue
+            seen.add(image["url"])
+            candidates.append(image["url"])
+            break
+    return candidates
+
+
+class ImagePipeline:
+    def __init__(self, http, storage, timeout=3, max_bytes=MAX_PHOTO_BYTES, recheck_after=86400, max_entries=10000):
+        self.http = http
+        self.storage = storage
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.recheck_after = recheck_after
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.uploads = 0
+        self.reused = 0
+
+    def remember_entry(self, url, entry):
+        self.entries[url] = entry
+        self.entries.move_to_end(url)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def entry(self, url):
+        if url in self.entries:
+            self.entries.move_to_end(url)
+            return self.entries[url]
+        entry = self.storage.get_image(url)
+        self.remember_entry(url, entry)
+        return entry
+
+    def save(self, url, file_id, valid):
+        self.remember_entry(url, (file_id, valid, time.time()))
+        self.storage.set_image(url, file_id, valid)
+
+    def photo(self, url):
+        entry = self.entry(url)
+        if entry and entry[0]:
+            self.reused += 1
+            return entry[0]
+        self.uploads += 1
+        return url
+
+    def remember(self, url, sent):
+        photo = getattr(sent, "photo", None)
+        if photo is not None and photo.file_id:
+            self.save(url, photo.file_id, True)
+
+    def reject(self, url):
+        self.save(url, None, False)
+
+    async def check(self, url):
+        try:
+            response = await self.http.head(url, timeout=self.timeout, allow_redirects=True)
+        except Exception as e:
+            logger.warning(f"Image check failed for {url}: {e}")
+            return False
+        if response.status != 200:
+            return False
+        content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        length = response.headers.get("Content-Length")
+        if length is not None:
+            try:
+                length = int(length)
+            except ValueError:
+                logger.warning(f"Bad Content-Length for {url}: {length!r}")
+                return False
+        return content_type in PHOTO_TYPES and (length is None or length <= self.max_bytes)
+
+    async def validate(self, url):
+        entry = self.entry(url)
+        if entry and (entry[0] or time.time() - entry[2] < self.recheck_after):
+            return entry[1]
+        valid = await self.check(url)
+        self.save(url, None, valid)
+        return valid
+
+    async def pick(self, results, limit=3):
+        candidates = lead_images(results)[:limit]
+        if not candidates:
+            return None
+        with span("images"):
+            checks = await asyncio.gather(*(self.validate(url) for url in candidates))
+        for url, valid in zip(candidates, checks):
+            if valid:
+                return url
+        return None
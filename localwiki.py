@@ -0,0 +1,221 @@
+import os
+import re
+import sys
+import gzip
+import json
+import math
+import time
+import sqlite3
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+from context import tokenize, trim
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    redirects TEXT NOT NULL DEFAULT '',
+    extract TEXT NOT NULL,
+    image TEXT,
+    revision INTEGER NOT NULL,
+    weight REAL NOT NULL DEFAULT 0,
+    generation INTEGER NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5(
+    title, redirects, extract,
+    content='pages', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS pages_ai AFTER INSERT ON pages BEGIN
+    INSERT INTO pages_fts (rowid, title, redirects, extract) VALUES (new.id, new.title, new.redirects, new.extract);
+END;
+CREATE TRIGGER IF NOT EXISTS pages_ad AFTER DELETE ON pages BEGIN
+    INSERT INTO pages_fts (pages_fts, rowid, title, redirects, extract) VALUES ('delete', old.id, old.title, old.redirects, old.extract);
+END;
+CREATE TRIGGER IF NOT EXISTS pages_au AFTER UPDATE OF title, redirects, extract ON pages BEGIN
+    INSERT INTO pages_fts (pages_fts, rowid, title, redirects, extract) VALUES ('delete', old.id, old.title, old.redirects, old.extract);
+    INSERT INTO pages_fts (rowid, title, redirects, extract) VALUES (new.id, new.title, new.redirects, new.extract);
+END;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+SEARCH_SQL = """
+SELECT pages.title, pages.extract, pages.image FROM pages_fts JOIN pages ON pages.id = pages_fts.rowid
+WHERE pages_fts MATCH ? ORDER BY bm25(pages_fts, 10.0, 5.0, 1.0) * (1.0 + pages.weight) LIMIT ?
+"""
+PAGE_IMAGE = re.compile(r"\((\d+),'page_image(?:_free)?','((?:[^'\\]|\\.)*)'")
+EXTRACT_CHARS = 2000
+
+
+def index_path(directory, language):
+    return os.path.join(directory, f"{language}wiki.db")
+
+
+def open_file(path):
+    return gzip.open(path, "rt", encoding="utf-8") if path.endswith(".gz") else open(path, encoding="utf-8")
+
+
+def read_cirrus(path):
+    page_id = None
+    with open_file(path) as f:
+        for line in f:
+            document = json.loads(line)
+            if "index" in document:
+                page_id = document["index"].get("_id")
+                continue
+            if document.get("namespace", 0) != 0:
+                continue
+            document.setdefault("page_id", page_id)
+            yield document
+
+
+def read_page_images(path):
+    images = {}
+    with open_file(path) as f:
+        for line in f:
+            if not line.startswith("INSERT INTO"):
+                continue
+            for page_id, name in PAGE_IMAGE.findall(line):
+                images[int(page_id)] = name.replace("\\'", "'").replace('\\"', '"').replace("\\\\", "\\")
+    return images
+
+
+class LocalWikiIndex:
+    def __init__(self, path, language):
+        self.path = path
+        self.language = language
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"localwiki-{language}")
+
+    def get_meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def page_url(self, title):
+        return f"https://{self.language}.wikipedia.org/wiki/{quote(title.replace(' ', '_'))}"
+
+    def image_url(self, name):
+        return f"https://{self.language}.wikipedia.org/wiki/Special:FilePath/{quote(name.replace(' ', '_'))}?width=1280"
+
+    def to_result(self, title, extract, image):
+        return {
+            "source": "LocalWiki",
+            "title": title,
+            "content": extract,
+            "url": self.page_url(title),
+            "images": [{"url": self.image_url(image), "kind": "thumbnail"}] if image else []
+        }
+
+    def lookup(self, query, limit=3):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        rows = []
+        with self.lock:
+            for match in (" ".join(f'"{term}"' for term in terms), " OR ".join(f'"{term}"*' for term in terms)):
+                rows = self.conn.execute(SEARCH_SQL, (match, limit)).fetchall()
+                if rows:
+                    break
+        return [self.to_result(title, extract, image) for title, extract, image in rows]
+
+    async def search(self, query, limit=3):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.lookup, query, limit)
+
+    def build(self, dump_path, page_props_path=None, batch_size=5000):
+        generation = int(self.get_meta("generation", "0")) + 1
+        images = read_page_images(page_props_path) if page_props_path else {}
+        known = dict(self.conn.execute("SELECT id, revision FROM pages"))
+        stats = {"added": 0, "updated": 0, "unchanged": 0, "deleted": 0}
+        pending = 0
+        started = time.monotonic()
+        self.conn.execute("BEGIN")
+        for document in read_cirrus(dump_path):
+            page_id = int(document["page_id"])
+            revision = int(document.get("version") or 0)
+            image = images.get(page_id)
+            if known.get(page_id) == revision:
+                self.conn.execute("UPDATE pages SET generation = ?, image = COALESCE(?, image) WHERE id = ?", (generation, image, page_id))
+                stats["unchanged"] += 1
+            else:
+                extract = trim(document.get("opening_text") or document.get("text") or "", EXTRACT_CHARS)
+                if not extract:
+                    continue
+                redirects = " | ".join(redirect["title"] for redirect in document.get("redirect", []) if redirect.get("namespace", 0) == 0)
+                weight = 0.1 * math.log1p(document.get("incoming_links") or 0)
+                self.conn.execute(
+                    "INSERT INTO pages (id, title, redirects, extract, image, revision, weight, generation) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET title = excluded.title, redirects = excluded.redirects, extract = excluded.extract, "
+                    "image = COALESCE(excluded.image, pages.image), revision = excluded.revision, weight = excluded.weight, generation = excluded.generation",
+                    (page_id, document["title"], redirects, extract, image, revision, weight, generation)
+                )
+                stats["updated" if page_id in known else "added"] += 1
+            pending += 1
+            if pending >= batch_size:
+                self.conn.commit()
+                self.conn.execute("BEGIN")
+                pending = 0
+        stats["deleted"] = self.conn.execute("DELETE FROM pages WHERE generation < ?", (generation,)).rowcount
+        self.set_meta("generation", generation)
+        self.set_meta("dump", os.path.basename(dump_path))
+        self.set_meta("built_at", int(time.time()))
+        self.conn.commit()
+        self.conn.execute("INSERT INTO pages_fts (pages_fts) VALUES ('optimize')")
+        self.conn.commit()
+        stats["seconds"] = round(time.monotonic() - started, 1)
+        return stats
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.conn.close()
+
+
+def index_ready(path):
+    if not os.path.exists(path):
+        return False
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            return conn.execute("SELECT 1 FROM pages LIMIT 1").fetchone() is not None
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return False
+
+
+def open_indexes(directory, languages):
+    return {
+        language: LocalWikiIndex(index_path(directory, language), language)
+        for language in languages
+        if index_ready(index_path(directory, language))
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 5 and sys.argv[1] == "build":
+        directory, language, dump = sys.argv[2], sys.argv[3], sys.argv[4]
+        os.makedirs(directory, exist_ok=True)
+        index = LocalWikiIndex(index_path(directory, language), language)
+        print(index.build(dump, sys.argv[5] if len(sys.argv) > 5 else None))
+        index.close()
+    elif len(sys.argv) == 5 and sys.argv[1] == "search":
+        index = LocalWikiIndex(index_path(sys.argv[2], sys.argv[3]), sys.argv[3])
+        started = time.perf_counter()
+        results = index.lookup(sys.argv[4])
+        print(f"{(time.perf_counter() - started) * 1000:.2f} ms")
+        for result in results:
+            print(f"- {result['title']}: {result['content'][:120]}")
+        index.close()
+    else:
+        print("Usage:")
+        print("  python localwiki.py build DIR LANG LANGwiki-YYYYMMDD-cirrussearch-content.json.gz [LANGwiki-YYYYMMDD-page_props.sql.gz]")
+        print("  python localwiki.py search DIR LANG \"so'rov\"")
+        sys.exit(1)
@@ -1,14 +1,33 @@
 import os
+import time
 import json
 import asyncio
 from datetime import datetime
-from pyrogram import Client, filters
-from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, Message
-import wikipedia
-import requests
-from bs4 import BeautifulSoup
+from pyrogram import Client, filters, idle
+from pyrogram.enums import ChatMemberStatus
+from pyrogram.errors import UserNotParticipant
+from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, Message, InlineQueryResultArticle, InputTextMessageContent
 import logging
 import re
+from http_client import pool_from_env
+from storage import Storage
+from cache import TieredCache, DiskCache, SingleFlight, normalize_query
+from broadcast import Broadcaster
+from wiki import WikipediaClient
+from extract import extract_async
+from scheduler import SearchScheduler
+from analytics import QueryAnalytics
+import metrics
+from metrics import span
+from context import build_context
+from streaming import StreamingReply, split_text, chunk_text, CAPTION_LIMIT
+from sources import SourceRegistry, SourceError
+from images import ImagePipeline
+from users import UserStore
+from cluster import ClusterSync, partition_filter, WARM_KEY
+from localwiki import open_indexes
+from suggest import Suggestions
+from warmer import CacheWarmer
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -18,40 +37,175 @@ API_HASH = os.getenv("API_HASH")
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 ADMIN_ID = int(os.getenv("ADMIN_ID"))
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+GOOGLE_SEARCH_URL = os.getenv("GOOGLE_SEARCH_URL", "https://www.google.com/search")
+BING_SEARCH_URL = os.getenv("BING_SEARCH_URL", "https://www.bing.com/search")
+DUCKDUCKGO_API_URL = os.getenv("DUCKDUCKGO_API_URL", "https://api.duckduckgo.com/")
+WIKIPEDIA_API_URL = os.getenv("WIKIPEDIA_API_URL", "https://{lang}.wikipedia.org/w/api.php")
+
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "16"))
+WORKER_INDEX = int(os.getenv("WORKER_INDEX", "0"))
+WORKER_COUNT = int(os.getenv("WORKER_COUNT", "1"))
+CLUSTER_SYNC_INTERVAL = float(os.getenv("CLUSTER_SYNC_INTERVAL", "2"))
+SESSION_NAME = "wikipedia_bot" if WORKER_COUNT == 1 else f"wikipedia_bot_{WORKER_INDEX}"
+
+app = Client(SESSION_NAME, api_id=API_ID, api_hash=API_HASH, bot_token=BOT_TOKEN, workers=BOT_WORKERS)
+
+DB_FILE = os.getenv("DB_FILE", "bot.db")
+LEGACY_DB_FILE = "database.json"
+
+SOURCE_TIMEOUTS = {
+    "wikipedia": float(os.getenv("WIKIPEDIA_TIMEOUT", "6")),
+    "google": float(os.getenv("GOOGLE_TIMEOUT", "4")),
+    "duckduckgo": float(os.getenv("DUCKDUCKGO_TIMEOUT", "4")),
+    "bing": float(os.getenv("BING_TIMEOUT", "4")),
+    "localwiki": float(os.getenv("LOCAL_WIKI_TIMEOUT", "1"))
+}
+SCRAPED_SOURCES = {"google", "bing"}
+PRIMARY_SOURCES = {"wikipedia", "localwiki"}
+SOURCE_HEALTH_WINDOW = int(os.getenv("SOURCE_HEALTH_WINDOW", "50"))
+SOURCE_MIN_SAMPLES = int(os.getenv("SOURCE_MIN_SAMPLES", "10"))
+SOURCE_FAILURE_RATE = float(os.getenv("SOURCE_FAILURE_RATE", "0.5"))
+SOURCE_COOLDOWN = float(os.getenv("SOURCE_COOLDOWN", "30"))
+SOURCE_MAX_COOLDOWN = float(os.getenv("SOURCE_MAX_COOLDOWN", "600"))
+SOURCE_HEDGING = os.getenv("SOURCE_HEDGING", "1") == "1"
+SOURCE_STATE_CODES = {"closed": 0, "half_open": 1, "open": 2}
+MAX_CONTEXT_RESULTS = int(os.getenv("MAX_CONTEXT_RESULTS", "10"))
+ENOUGH_RESULTS = int(os.getenv("ENOUGH_RESULTS", str(MAX_CONTEXT_RESULTS)))
+CONTEXT_TOKEN_BUDGETS = {
+    "uz": int(os.getenv("CONTEXT_TOKENS_UZ", "1600")),
+    "ru": int(os.getenv("CONTEXT_TOKENS_RU", "1400")),
+    "en": int(os.getenv("CONTEXT_TOKENS_EN", "1200"))
+}
+CONTEXT_SNIPPET_CHARS = int(os.getenv("CONTEXT_SNIPPET_CHARS", "500"))
+
+SOURCE_CACHE_TTLS = {
+    "wikipedia": int(os.getenv("WIKIPEDIA_CACHE_TTL", "86400")),
+    "google": int(os.getenv("GOOGLE_CACHE_TTL", "3600")),
+    "duckduckgo": int(os.getenv("DUCKDUCKGO_CACHE_TTL", "21600")),
+    "bing": int(os.getenv("BING_CACHE_TTL", "3600")),
+    "localwiki": 0
+}
+LOCAL_WIKI_DIR = os.getenv("LOCAL_WIKI_DIR", "")
+LOCAL_WIKI_ONLY = os.getenv("LOCAL_WIKI_ONLY", "0") == "1"
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "21600"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_DB_FILE = os.getenv("CACHE_DB_FILE", "cache.db")
+CACHE_DISK_MAX_ROWS = int(os.getenv("CACHE_DISK_MAX_ROWS", "100000"))
+
+MEMBER_CACHE_TTL = int(os.getenv("MEMBER_CACHE_TTL", "600"))
+NONMEMBER_CACHE_TTL = int(os.getenv("NONMEMBER_CACHE_TTL", "30"))
+MEMBER_CACHE_MAX = int(os.getenv("MEMBER_CACHE_MAX", "200000"))
+
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "30"))
+BROADCAST_WORKERS = int(os.getenv("BROADCAST_WORKERS", "20"))
+
+SEARCH_CONCURRENCY = int(os.getenv("SEARCH_CONCURRENCY", "20"))
+SEARCH_QUEUE_SIZE = int(os.getenv("SEARCH_QUEUE_SIZE", "100"))
+
+INLINE_RESULTS = int(os.getenv("INLINE_RESULTS", "8"))
+INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", "30"))
+SUGGEST_MIN_COUNT = int(os.getenv("SUGGEST_MIN_COUNT", "3"))
+
+WARM_ENABLED = os.getenv("WARM_ENABLED", "0") == "1"
+WARM_INTERVAL = float(os.getenv("WARM_INTERVAL", "60"))
+WARM_MAX_LOAD = float(os.getenv("WARM_MAX_LOAD", "0.5"))
+WARM_PER_CYCLE = int(os.getenv("WARM_PER_CYCLE", "10"))
+WARM_REQUEST_BUDGET = int(os.getenv("WARM_REQUEST_BUDGET", "400"))
+WARM_TOKEN_BUDGET = int(os.getenv("WARM_TOKEN_BUDGET", "100000"))
+WARM_TOKENS_PER_ANSWER = int(os.getenv("WARM_TOKENS_PER_ANSWER", "3000"))
+WARM_REFRESH_BEFORE = int(os.getenv("WARM_REFRESH_BEFORE", "1800"))
+
+IMAGE_CHECK_TIMEOUT = float(os.getenv("IMAGE_CHECK_TIMEOUT", "3"))
+IMAGE_RECHECK_AFTER = int(os.getenv("IMAGE_RECHECK_AFTER", "86400"))
+IMAGE_CACHE_ENTRIES = int(os.getenv("IMAGE_CACHE_ENTRIES", "10000"))
+
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+if METRICS_PORT:
+    METRICS_PORT += WORKER_INDEX
+
+STREAM_ANSWERS = os.getenv("STREAM_ANSWERS", "1") == "1"
+STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL", "1"))
+STREAM_MIN_CHARS = int(os.getenv("STREAM_MIN_CHARS", "80"))
+
+SCRAPER_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+}
+
+http = pool_from_env()
+
+store = Storage(DB_FILE, flush_interval=float(os.getenv("DB_FLUSH_INTERVAL", "1")))
+if os.path.exists(LEGACY_DB_FILE):
+    store.migrate_json(LEGACY_DB_FILE)
+db = store.load()
+users = UserStore(store, partition=(WORKER_INDEX, WORKER_COUNT))
+owned = partition_filter(WORKER_INDEX, WORKER_COUNT)
+analytics = QueryAnalytics(store.total_searches(), store.top_searches(10))
+store.backfill_query_languages()
+suggestions = Suggestions(top_n=INLINE_RESULTS, min_count=SUGGEST_MIN_COUNT)
+suggestions.load(store)
+
+disk_cache = DiskCache(CACHE_DB_FILE, CACHE_DISK_MAX_ROWS) if CACHE_DB_FILE else None
+source_cache = TieredCache("sources", CACHE_MAX_BYTES // 2, 3600, disk_cache)
+answer_cache = TieredCache("answers", CACHE_MAX_BYTES // 2, ANSWER_CACHE_TTL, disk_cache)
+flights = SingleFlight()
+scheduler = SearchScheduler(SEARCH_CONCURRENCY, SEARCH_QUEUE_SIZE)
+image_pipeline = ImagePipeline(http, store, timeout=IMAGE_CHECK_TIMEOUT, recheck_after=IMAGE_RECHECK_AFTER, max_entries=IMAGE_CACHE_ENTRIES)
+
+def collect_metrics():
+    for cache in (source_cache, answer_cache):
+        stats = cache.stats()
+        metrics.CACHE_HITS.set(stats["hits"] + stats["disk_hits"], cache=cache.name)
+        metrics.CACHE_MISSES.set(stats["misses"], cache=cache.name)
+        metrics.CACHE_BYTES.set(stats["bytes"], cache=cache.name)
+    metrics.IN_FLIGHT.set(scheduler.running, state="running")
+    metrics.IN_FLIGHT.set(scheduler.waiting + scheduler.queued, state="queued")
+    for name, health in source_registry.sources.items():
+        metrics.SOURCE_STATE.set(SOURCE_STATE_CODES[health.state], source=name)
+        metrics.SOURCE_HEDGES.set(health.hedges, source=name)
+
+metrics.collectors.append(collect_metrics)
+
+member_cache = {}
+
+def cache_membership(channel, user_id, is_member):
+    if len(member_cache) >= MEMBER_CACHE_MAX:
+        now = time.monotonic()
+        for key in [key for key, entry in member_cache.items() if entry[1] <= now]:
+            del member_cache[key]
+        if len(member_cache) >= MEMBER_CACHE_MAX:
+            member_cache.clear()
+    ttl = MEMBER_CACHE_TTL if is_member else NONMEMBER_CACHE_TTL
+    member_cache[(channel, user_id)] = (is_member, time.monotonic() + ttl)
+
+async def fetch_membership(channel, user_id):
+    try:
+        member = await app.get_chat_member(channel, user_id)
+        is_member = member.status not in [ChatMemberStatus.LEFT, ChatMemberStatus.BANNED]
+    except UserNotParticipant:
+        is_member = False
+    except Exception as e:
+        logger.error(f"Subscription check error ({channel}): {e}")
+        return True
+    cache_membership(channel, user_id, is_member)
+    return is_member
 
-app = Client("wikipedia_bot", api_id=API_ID, api_hash=API_HASH, bot_token=BOT_TOKEN)
-
-DB_FILE = "database.json"
-
-def load_db():
-    if os.path.exists(DB_FILE):
-        with open(DB_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {
-        "users": {},
-        "channels": [],
-        "searches": {},
-        "ads": [],
-        "user_language": {}
-    }
-
-def save_db(data):
-    with open(DB_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-
-db = load_db()
-
-async def check_subscription(user_id):
+async def check_subscription(user_id, recheck_negative=False):
     if not db["channels"]:
         return True
+    now = time.monotonic()
+    unknown = []
     for channel in db["channels"]:
-        try:
-            member = await app.get_chat_member(channel, user_id)
-            if member.status in ["left", "kicked"]:
-                return False
-        except:
-            continue
-    return True
+        entry = member_cache.get((channel, user_id))
+        if entry is None or entry[1] <= now or (recheck_negative and not entry[0]):
+            unknown.append(channel)
+        elif not entry[0]:
+            return False
+    if not unknown:
+        return True
+    results = await asyncio.gather(*(fetch_membership(channel, user_id) for channel in unknown))
+    return all(results)
 
 def subscription_keyboard():
     buttons = []
@@ -73,39 +227,74 @@ def admin_panel_keyboard():
         [InlineKeyboardButton("📢 Kanallar", callback_data="admin_channels")],
         [InlineKeyboardButton("📣 Reklama yuborish", callback_data="admin_broadcast")],
         [InlineKeyboardButton("🔍 Eng ko'p qidirilganlar", callback_data="admin_top_searches")],
+        [InlineKeyboardButton("🩺 Manbalar holati", callback_data="admin_sources")],
         [InlineKeyboardButton("❌ Yopish", callback_data="admin_close")]
     ])
 
+def top_searches_keyboard():
+    return InlineKeyboardMarkup([
+        [
+            InlineKeyboardButton("🕐 Soat", callback_data="admin_top_hour"),
+            InlineKeyboardButton("📅 Kun", callback_data="admin_top_day"),
+            InlineKeyboardButton("🗓 Hafta", callback_data="admin_top_week"),
+            InlineKeyboardButton("♾ Jami", callback_data="admin_top_searches")
+        ],
+        [InlineKeyboardButton("🔙 Orqaga", callback_data="admin_back")]
+    ])
+
 def add_user(user_id, username, first_name):
-    if str(user_id) not in db["users"]:
-        db["users"][str(user_id)] = {
-            "username": username,
-            "first_name": first_name,
-            "joined_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "search_count": 0
-        }
-        save_db(db)
+    users.add(user_id, username, first_name, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
 
-def add_search(query):
-    query_lower = query.lower()
-    if query_lower in db["searches"]:
-        db["searches"][query_lower] += 1
-    else:
-        db["searches"][query_lower] = 1
-    save_db(db)
+def add_search(query, lang="uz"):
+    query_lower = normalize_query(query)
+    count = store.incr_search(query_lower)
+    analytics.record(query_lower, count)
+    suggestions.record(lang, query_lower, store.incr_query_language(lang, query_lower))
+    warmer.observe(lang, query_lower)
+
+def prune_user(user_id):
+    users.remove(user_id)
+
+broadcaster = Broadcaster(app, store, users, prune_user, rate=BROADCAST_RATE, workers=BROADCAST_WORKERS, owner=SESSION_NAME)
+
+def reload_channels(channels):
+    db["channels"][:] = channels
+    member_cache.clear()
+
+cluster = ClusterSync(
+    store, WORKER_INDEX, reload_channels, analytics, broadcaster,
+    interval=CLUSTER_SYNC_INTERVAL, snapshots={WARM_KEY: lambda: warmer.snapshot()}
+)
+
+def analytics_view():
+    if WORKER_COUNT > 1:
+        return cluster.view()
+    return analytics.snapshot()
 
 def get_user_language(user_id):
-    return db.get("user_language", {}).get(str(user_id), "uz")
+    return users.get_language(user_id)
 
 def set_user_language(user_id, lang):
-    if "user_language" not in db:
-        db["user_language"] = {}
-    db["user_language"][str(user_id)] = lang
-    save_db(db)
+    users.set_language(user_id, lang)
 
-async def ai_analyze_and_answer(query, collected_info, language="uz"):
+async def read_completion_stream(response, on_delta):
+    answer = ""
+    async for raw in response.content:
+        line = raw.decode("utf-8", errors="replace").strip()
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            break
+        delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+        if delta:
+            answer += delta
+            on_delta(answer)
+    return answer or None
+
+async def ai_analyze_and_answer(query, collected_info, language="uz", on_delta=None):
     try:
-        url = "https://api.groq.com/openai/v1/chat/completions"
+        url = GROQ_API_URL
         
         lang_instruction = {
             "uz": "O'zbek tilida javob ber",
@@ -118,10 +307,12 @@ async def ai_analyze_and_answer(query, collected_info, language="uz"):
             "Content-Type": "application/json"
         }
         
+        instruction = lang_instruction.get(language, lang_instruction["uz"])
+        
         system_prompt = f"""Siz professional ma'lumot tahlilchisisiz. Foydalanuvchi savoliga to'liq, aniq va tushunarli javob bering.
 
 Qoidalar:
-1. {lang_instruction.get(language, 'O\'zbek tilida javob ber')}
+1. {instruction}
 2. Ma'lumotni tartibli va ravon tarzda yozing
 3. Muhim faktlarni ajratib ko'rsating
 4. Agar ma'lumot yetarli bo'lmasa, mavjud ma'lumot asosida javob bering
@@ -146,9 +337,16 @@ Ushbu savol va ma'lumotlar asosida to'liq, aniq va foydali javob tayyorlang."""
             "max_tokens": 2000
         }
         
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
+        if on_delta is not None:
+            payload["stream"] = True
+            async with http.stream("POST", url, headers=headers, json=payload, timeout=60) as response:
+                if response.status != 200:
+                    return None
+                return await read_completion_stream(response, on_delta)
         
-        if response.status_code == 200:
+        response = await http.post(url, headers=headers, json=payload, timeout=30)
+        
+        if response.status == 200:
             result = response.json()
             return result['choices'][0]['message']['content']
         else:
@@ -157,129 +355,144 @@ Ushbu savol va ma'lumotlar asosida to'liq, aniq va foydali javob tayyorlang."""
         logger.error(f"AI Error: {e}")
         return None
 
+wiki_clients = {lang: WikipediaClient(http, lang, WIKIPEDIA_API_URL.format(lang=lang)) for lang in ("uz", "ru", "en")}
+
 async def search_wikipedia(query, language="uz"):
-    results = []
-    try:
-        wiki_lang = {"uz": "uz", "ru": "ru", "en": "en"}
-        wikipedia.set_lang(wiki_lang.get(language, "uz"))
-        
-        search_results = wikipedia.search(query, results=3)
-        
-        for result in search_results:
-            try:
-                page = wikipedia.page(result)
-                results.append({
-                    "source": "Wikipedia",
-                    "title": page.title,
-                    "content": page.summary[:1500],
-                    "url": page.url,
-                    "images": page.images[:3] if page.images else []
-                })
-            except:
-                continue
-    except:
-        pass
-    
-    return results
+    return await wiki_clients.get(language, wiki_clients["uz"]).search(query, limit=3)
 
-async def search_google(query):
-    results = []
-    try:
-        search_url = f"https://www.google.com/search?q={query}&num=5"
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-        }
-        response = requests.get(search_url, headers=headers, timeout=10)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        for g in soup.find_all('div', class_='g'):
-            try:
-                title = g.find('h3')
-                description = g.find('div', class_='VwiC3b')
-                link = g.find('a')
-                
-                if title and description and link:
-                    results.append({
-                        "source": "Google",
-                        "title": title.get_text(),
-                        "content": description.get_text(),
-                        "url": link.get('href', '')
-                    })
-            except:
-                continue
-                
-        if not results:
-            divs = soup.find_all('div', class_='BNeawe')
-            for i, div in enumerate(divs[:5]):
-                results.append({
-                    "source": "Google",
-                    "title": f"Natija {i+1}",
-                    "content": div.get_text()
-                })
-    except:
-        pass
-    
-    return results
+local_wiki = open_indexes(LOCAL_WIKI_DIR, ("uz", "ru", "en")) if LOCAL_WIKI_DIR else {}
 
-async def search_duckduckgo(query):
+async def search_localwiki(query, language="uz"):
+    index = local_wiki.get(language)
+    if index is None:
+        return []
+    return await index.search(query, limit=3)
+
+async def search_google(query, language="uz"):
+    response = await http.get(GOOGLE_SEARCH_URL, params={"q": query, "num": 5}, headers=SCRAPER_HEADERS, timeout=SOURCE_TIMEOUTS["google"])
+    if response.status != 200:
+        raise SourceError(f"HTTP {response.status}")
+    return await extract_async("google", response.text())
+
+async def search_duckduckgo(query, language="uz"):
     results = []
-    try:
-        url = f"https://api.duckduckgo.com/?q={query}&format=json"
-        response = requests.get(url, timeout=10)
-        data = response.json()
-        
-        if data.get('Abstract'):
+    response = await http.get(DUCKDUCKGO_API_URL, params={"q": query, "format": "json"}, timeout=SOURCE_TIMEOUTS["duckduckgo"])
+    if response.status != 200:
+        raise SourceError(f"HTTP {response.status}")
+    data = response.json()
+    
+    if data.get('Abstract'):
+        results.append({
+            "source": "DuckDuckGo",
+            "title": data.get('Heading', 'Abstract'),
+            "content": data.get('Abstract'),
+            "url": data.get('AbstractURL', '')
+        })
+    
+    for topic in data.get('RelatedTopics', [])[:3]:
+        if isinstance(topic, dict) and 'Text' in topic:
             results.append({
                 "source": "DuckDuckGo",
-                "title": data.get('Heading', 'Abstract'),
-                "content": data.get('Abstract'),
-                "url": data.get('AbstractURL', '')
+                "title": topic.get('Text', '')[:100],
+                "content": topic.get('Text', ''),
+                "url": topic.get('FirstURL', '')
             })
-        
-        for topic in data.get('RelatedTopics', [])[:3]:
-            if isinstance(topic, dict) and 'Text' in topic:
-                results.append({
-                    "source": "DuckDuckGo",
-                    "title": topic.get('Text', '')[:100],
-                    "content": topic.get('Text', ''),
-                    "url": topic.get('FirstURL', '')
-                })
-    except:
-        pass
     
     return results
 
-async def search_bing(query):
-    results = []
-    try:
-        search_url = f"https://www.bing.com/search?q={query}"
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-        }
-        response = requests.get(search_url, headers=headers, timeout=10)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        for result in soup.find_all('li', class_='b_algo')[:3]:
-            try:
-                title = result.find('h2')
-                desc = result.find('p')
-                link = result.find('a')
-                
-                if title and desc:
-                    results.append({
-                        "source": "Bing",
-                        "title": title.get_text(),
-                        "content": desc.get_text(),
-                        "url": link.get('href', '') if link else ''
-                    })
-            except:
-                continue
-    except:
-        pass
-    
+async def search_bing(query, language="uz"):
+    response = await http.get(BING_SEARCH_URL, params={"q": query}, headers=SCRAPER_HEADERS, timeout=SOURCE_TIMEOUTS["bing"])
+    if response.status != 200:
+        raise SourceError(f"HTTP {response.status}")
+    return await extract_async("bing", response.text())
+
+SOURCES = {
+    "wikipedia": search_wikipedia,
+    "google": search_google,
+    "duckduckgo": search_duckduckgo,
+    "bing": search_bing
+}
+if local_wiki:
+    SOURCES["localwiki"] = search_localwiki
+
+source_registry = SourceRegistry(hedging=SOURCE_HEDGING)
+for name in SOURCES:
+    source_registry.register(
+        name,
+        empty_is_failure=name in SCRAPED_SOURCES,
+        window=SOURCE_HEALTH_WINDOW,
+        min_samples=SOURCE_MIN_SAMPLES,
+        failure_rate=SOURCE_FAILURE_RATE,
+        cooldown=SOURCE_COOLDOWN,
+        max_cooldown=SOURCE_MAX_COOLDOWN
+    )
+
+async def fetch_source(name, query, language):
+    key = f"{name}:{language}:{normalize_query(query)}"
+    results = source_cache.get(key) if SOURCE_CACHE_TTLS[name] else None
+    if results is not None:
+        return results
+    if not source_registry.allow(name):
+        metrics.SOURCE_SKIPPED.inc(source=name)
+        return []
+    with span(f"source_{name}"):
+        results = await source_registry.call(name, lambda: SOURCES[name](query, language), SOURCE_TIMEOUTS[name])
+    metrics.SOURCE_RESULTS.inc(len(results), source=name)
+    if not results:
+        metrics.SOURCE_EMPTY.inc(source=name)
+    elif SOURCE_CACHE_TTLS[name]:
+        source_cache.set(key, results, SOURCE_CACHE_TTLS[name])
     return results
 
-@app.on_message(filters.command("start"))
+async def gather_sources(query, language="uz"):
+    sources = {
+        name: fetch_source(name, query, language) for name in SOURCES
+        if not (name == "localwiki" and language not in local_wiki)
+        and not (LOCAL_WIKI_ONLY and name == "wikipedia" and language in local_wiki)
+    }
+    tasks = {asyncio.create_task(coro): name for name, coro in sources.items()}
+    collected = {}
+    pending = set(tasks)
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            name = tasks[task]
+            try:
+                collected[name] = task.result()
+            except asyncio.TimeoutError:
+                logger.warning(f"{name} timed out after {SOURCE_TIMEOUTS[name]}s")
+            except Exception as e:
+                logger.error(f"{name} error: {e}")
+        if sum(len(r) for r in collected.values()) >= ENOUGH_RESULTS and not any(tasks[task] in PRIMARY_SOURCES for task in pending):
+            break
+    for task in pending:
+        task.cancel()
+    
+    all_results = []
+    for name in sources:
+        all_results.extend(collected.get(name, []))
+    return all_results
+
+async def warm_query(lang, query):
+    await flights.run(f"{lang}:{query}", lambda emit: scheduler.slot(lambda: run_pipeline(query, lang, emit)))
+
+warmer = CacheWarmer(
+    warm_query,
+    answer_cache.expires_in,
+    scheduler.load,
+    lambda lang, limit: suggestions.suggest(lang, "", limit, unattributed=False),
+    interval=WARM_INTERVAL,
+    max_load=WARM_MAX_LOAD,
+    request_budget=WARM_REQUEST_BUDGET,
+    token_budget=WARM_TOKEN_BUDGET,
+    requests_per_answer=len(SOURCES),
+    tokens_per_answer=WARM_TOKENS_PER_ANSWER,
+    refresh_before=WARM_REFRESH_BEFORE,
+    per_cycle=WARM_PER_CYCLE,
+    peers=(lambda: cluster.peers(WARM_KEY)) if WORKER_COUNT > 1 else None
+)
+
+@app.on_message(filters.command("start") & owned)
 async def start_command(client, message: Message):
     user_id = message.from_user.id
     username = message.from_user.username or "No username"
@@ -304,7 +517,7 @@ async def start_command(client, message: Message):
     
     await message.reply_text(messages.get(lang, messages["uz"]))
 
-@app.on_message(filters.command("language"))
+@app.on_message(filters.command("language") & owned)
 async def language_command(client, message: Message):
     lang = get_user_language(message.from_user.id)
     
@@ -316,7 +529,7 @@ async def language_command(client, message: Message):
     
     await message.reply_text(texts.get(lang, texts["uz"]), reply_markup=language_keyboard())
 
-@app.on_callback_query()
+@app.on_callback_query(owned)
 async def callback_handler(client, callback_query):
     user_id = callback_query.from_user.id
     data = callback_query.data
@@ -336,7 +549,7 @@ async def callback_handler(client, callback_query):
         return
     
     if data == "check_sub":
-        if await check_subscription(user_id):
+        if await check_subscription(user_id, recheck_negative=True):
             await callback_query.message.delete()
             
             lang = get_user_language(user_id)
@@ -362,10 +575,25 @@ async def callback_handler(client, callback_query):
         return
     
     if data == "admin_stats":
-        total_users = len(db["users"])
-        total_searches = sum(db["searches"].values())
+        total_users = users.count()
+        total_searches = analytics.total if WORKER_COUNT == 1 else store.total_searches()
+        sources_stats = source_cache.stats()
+        answers_stats = answer_cache.stats()
         text = f"📊 **Statistika**\n\n👥 Foydalanuvchilar: {total_users}\n🔍 Qidiruvlar: {total_searches}"
+        text += f"\n\n💾 Javoblar keshi: {answers_stats['hits'] + answers_stats['disk_hits']} hit / {answers_stats['misses']} miss"
+        text += f"\n💾 Manbalar keshi: {sources_stats['hits'] + sources_stats['disk_hits']} hit / {sources_stats['misses']} miss"
+        text += f"\n🔗 Birlashtirilgan so'rovlar: {flights.coalesced}"
+        text += f"\n⚙️ Faol qidiruvlar: {scheduler.running} (navbatda: {scheduler.waiting + scheduler.queued}, rad etilgan: {scheduler.rejected})"
+        text += f"\n🔥 Oldindan tayyorlangan javoblar: {warmer.runs} (ishlatilgan: {warmer.hits}, pauza: {warmer.paused})"
+        text += f"\n🖼 Rasmlar: {image_pipeline.reused} file_id orqali / {image_pipeline.uploads} URL orqali"
         await callback_query.message.edit_text(text, reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Orqaga", callback_data="admin_back")]]))
+    elif data == "admin_sources":
+        text = "🩺 **Manbalar holati**\n(kechikish p50/p95, natija, bo'sh, xato)\n\n" + "\n".join(source_registry.status_lines())
+        keyboard = InlineKeyboardMarkup([
+            [InlineKeyboardButton("🔄 Yangilash", callback_data="admin_sources")],
+            [InlineKeyboardButton("🔙 Orqaga", callback_data="admin_back")]
+        ])
+        await callback_query.message.edit_text(text, reply_markup=keyboard)
     elif data == "admin_channels":
         channels_text = "📢 **Majburiy kanallar:**\n\n"
         if db["channels"]:
@@ -377,18 +605,45 @@ async def callback_handler(client, callback_query):
         await callback_query.message.edit_text(channels_text, reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Orqaga", callback_data="admin_back")]]))
     elif data == "admin_broadcast":
         await callback_query.message.edit_text("📣 **Reklama yuborish**\n\nYubormoqchi bo'lgan xabaringizni yuboring.\nFormat: /broadcast [xabar]", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Orqaga", callback_data="admin_back")]]))
-    elif data == "admin_top_searches":
-        top = sorted(db["searches"].items(), key=lambda x: x[1], reverse=True)[:10]
-        text = "🔍 **Eng ko'p qidirilgan 10 ta so'rov:**\n\n"
+    elif data == "admin_top_searches" or data.startswith("admin_top_"):
+        period = data.replace("admin_top_", "")
+        period_titles = {
+            "searches": "Eng ko'p qidirilgan 10 ta so'rov",
+            "hour": "Oxirgi 1 soatda eng ko'p qidirilganlar",
+            "day": "Oxirgi 24 soatda eng ko'p qidirilganlar",
+            "week": "Oxirgi 7 kunda eng ko'p qidirilganlar"
+        }
+        view = analytics_view()
+        if period in view["windows"]:
+            window = view["windows"][period]
+            top = window["top"]
+            text = f"🔍 **{period_titles[period]}:**\n(jami: {window['total']})\n\n"
+        else:
+            period = "searches"
+            top = view["top"]
+            text = f"🔍 **{period_titles[period]}:**\n\n"
         for i, (query, count) in enumerate(top, 1):
             text += f"{i}. {query} - {count} marta\n"
-        await callback_query.message.edit_text(text, reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Orqaga", callback_data="admin_back")]]))
+        await callback_query.message.edit_text(text, reply_markup=top_searches_keyboard())
     elif data == "admin_back":
         await callback_query.message.edit_text("👨‍💼 **Admin Panel**\n\nQuyidagi tugmalardan birini tanlang:", reply_markup=admin_panel_keyboard())
     elif data == "admin_close":
         await callback_query.message.delete()
 
-@app.on_message(filters.command("addchannel") & filters.user(ADMIN_ID))
+@app.on_chat_member_updated(owned)
+async def chat_member_handler(client, update):
+    member = update.new_chat_member or update.old_chat_member
+    if not member or not member.user:
+        return
+    chat_keys = {str(update.chat.id)}
+    if update.chat.username:
+        chat_keys.add(f"@{update.chat.username.lower()}")
+    for channel in db["channels"]:
+        if channel.lower() in chat_keys:
+            is_member = bool(update.new_chat_member) and update.new_chat_member.status not in [ChatMemberStatus.LEFT, ChatMemberStatus.BANNED]
+            cache_membership(channel, member.user.id, is_member)
+
+@app.on_message(filters.command("addchannel") & filters.user(ADMIN_ID) & owned)
 async def add_channel(client, message: Message):
     if len(message.command) < 2:
         await message.reply_text("❌ Format: /addchannel @kanal")
@@ -396,12 +651,13 @@ async def add_channel(client, message: Message):
     channel = message.command[1]
     if channel not in db["channels"]:
         db["channels"].append(channel)
-        save_db(db)
+        store.add_channel(channel)
+        cluster.bump_channels()
         await message.reply_text(f"✅ {channel} qo'shildi!")
     else:
         await message.reply_text("❌ Bu kanal allaqachon qo'shilgan!")
 
-@app.on_message(filters.command("removechannel") & filters.user(ADMIN_ID))
+@app.on_message(filters.command("removechannel") & filters.user(ADMIN_ID) & owned)
 async def remove_channel(client, message: Message):
     if len(message.command) < 2:
         await message.reply_text("❌ Format: /removechannel @kanal")
@@ -409,142 +665,231 @@ async def remove_channel(client, message: Message):
     channel = message.command[1]
     if channel in db["channels"]:
         db["channels"].remove(channel)
-        save_db(db)
+        store.remove_channel(channel)
+        cluster.bump_channels()
         await message.reply_text(f"✅ {channel} o'chirildi!")
     else:
         await message.reply_text("❌ Bu kanal ro'yxatda yo'q!")
 
-@app.on_message(filters.command("broadcast") & filters.user(ADMIN_ID))
+@app.on_message(filters.command("broadcast") & filters.user(ADMIN_ID) & owned)
 async def broadcast(client, message: Message):
     if len(message.command) < 2:
         await message.reply_text("❌ Format: /broadcast [xabar]")
         return
+    if broadcaster.running():
+        await message.reply_text("⏳ Avvalgi reklama hali yuborilmoqda!")
+        return
     text = message.text.split(None, 1)[1]
-    success = 0
-    failed = 0
     status_msg = await message.reply_text("📤 Yuborilmoqda...")
-    for user_id in db["users"]:
+    broadcaster.start(text, status_msg.chat.id, status_msg.id)
+
+async def send_answer(message, processing, ai_response, images):
+    text = f"🤖 **AI Javob:**\n\n{ai_response}"
+    if images:
+        url = images[0]
+        caption, rest = split_text(text, CAPTION_LIMIT)
         try:
-            await client.send_message(int(user_id), text)
-            success += 1
-        except:
-            failed += 1
-        await asyncio.sleep(0.05)
-    await status_msg.edit_text(f"✅ Yuborildi: {success}\n❌ Xato: {failed}")
-
-@app.on_message(filters.text & filters.private)
+            sent = await message.reply_photo(image_pipeline.photo(url), caption=caption)
+        except Exception as e:
+            logger.warning(f"Photo send failed for {url}: {e}")
+            image_pipeline.reject(url)
+        else:
+            image_pipeline.remember(url, sent)
+            if processing:
+                await processing.delete()
+            for chunk in chunk_text(rest):
+                await message.reply_text(chunk)
+            return
+    
+    chunks = chunk_text(text)
+    if processing:
+        await processing.edit_text(chunks[0])
+    else:
+        await message.reply_text(chunks[0])
+    for chunk in chunks[1:]:
+        await message.reply_text(chunk)
+
+def assemble_context(query, all_results, lang):
+    with span("context"):
+        return build_context(
+            query,
+            all_results,
+            lang,
+            token_budget=CONTEXT_TOKEN_BUDGETS.get(lang, CONTEXT_TOKEN_BUDGETS["uz"]),
+            snippet_chars=CONTEXT_SNIPPET_CHARS,
+            max_snippets=MAX_CONTEXT_RESULTS
+        )
+
+async def run_pipeline(query, lang, emit):
+    on_delta = (lambda text: emit("delta", text)) if STREAM_ANSWERS else None
+    
+    with span("sources"):
+        all_results = await gather_sources(query, lang)
+    
+    lead_image = asyncio.create_task(image_pipeline.pick(all_results))
+    if all_results:
+        emit("analyzing")
+        with span("ai"):
+            ai_response = await ai_analyze_and_answer(query, assemble_context(query, all_results, lang), lang, on_delta=on_delta)
+    else:
+        emit("fallback")
+        with span("ai"):
+            ai_response = await ai_analyze_and_answer(
+                query, 
+                f"Foydalanuvchi '{query}' haqida so'radi. Umumiy bilimlaringiz asosida javob bering.",
+                lang,
+                on_delta=on_delta
+            )
+    
+    image = await lead_image
+    images = [image] if image else []
+    outcome = {"answer": ai_response, "images": images, "results": all_results[:1]}
+    if ai_response:
+        answer_cache.set(f"{lang}:{normalize_query(query)}", {"answer": ai_response, "images": images})
+    return outcome
+
+@app.on_inline_query(owned)
+async def inline_handler(client, inline_query):
+    lang = get_user_language(inline_query.from_user.id)
+    with span("suggest"):
+        matches = suggestions.suggest(lang, normalize_query(inline_query.query), INLINE_RESULTS)
+    count_texts = {
+        "uz": "{} marta qidirilgan",
+        "ru": "искали {} раз",
+        "en": "searched {} times"
+    }
+    results = []
+    for i, (query, count) in enumerate(matches):
+        cached = answer_cache.cached(f"{lang}:{query}")
+        results.append(InlineQueryResultArticle(
+            id=str(i),
+            title=query,
+            description=("⚡ " if cached else "") + count_texts.get(lang, count_texts["uz"]).format(count),
+            input_message_content=InputTextMessageContent(query)
+        ))
+    await inline_query.answer(results, cache_time=INLINE_CACHE_TIME)
+
+@app.on_message(filters.text & filters.private & owned)
 async def search_handler(client, message: Message):
     user_id = message.from_user.id
     if message.text.startswith('/'):
         return
     
-    if not await check_subscription(user_id):
+    with span("subscription"):
+        subscribed = await check_subscription(user_id)
+    if not subscribed:
         await message.reply_text("❗️ Botdan foydalanish uchun quyidagi kanallarga obuna bo'ling:", reply_markup=subscription_keyboard())
         return
     
     query = message.text
-    add_search(query)
-    
-    if str(user_id) in db["users"]:
-        db["users"][str(user_id)]["search_count"] += 1
-        save_db(db)
-    
     lang = get_user_language(user_id)
+    with span("db_write"):
+        add_search(query, lang)
+        store.incr_user_searches(user_id)
+    
+    answer_key = f"{lang}:{normalize_query(query)}"
+    cached = answer_cache.get(answer_key)
+    if cached is not None:
+        warmer.served(answer_key)
+        with span("telegram_send"):
+            await send_answer(message, None, cached["answer"], cached["images"])
+        return
     
+    if not scheduler.submit(user_id, lambda: process_search(message, query, lang), shared=answer_key in flights.flights):
+        busy_texts = {
+            "uz": "⏳ Hozir so'rovlar juda ko'p. Birozdan keyin qayta urinib ko'ring.",
+            "ru": "⏳ Сейчас слишком много запросов. Попробуйте чуть позже.",
+            "en": "⏳ Too many requests right now. Please try again shortly."
+        }
+        await message.reply_text(busy_texts.get(lang, busy_texts["uz"]))
+
+async def process_search(message, query, lang):
     status_texts = {
         "uz": "🔍 Qidiryapman...",
         "ru": "🔍 Ищу...",
         "en": "🔍 Searching..."
     }
+    analyzing_texts = {
+        "uz": "🔍 AI tahlil qilyapti...",
+        "ru": "🔍 AI анализирует...",
+        "en": "🔍 AI analyzing..."
+    }
+    fallback_texts = {
+        "uz": "🔍 Keling, boshqa usulda qidiramiz...",
+        "ru": "🔍 Давайте попробуем другой способ...",
+        "en": "🔍 Let me try another way..."
+    }
+    error_texts = {
+        "uz": "❌ Xatolik yuz berdi. Qaytadan urinib ko'ring.",
+        "ru": "❌ Произошла ошибка. Попробуйте снова.",
+        "en": "❌ An error occurred. Please try again."
+    }
+    
+    answer_key = f"{lang}:{normalize_query(query)}"
+    with span("telegram_send"):
+        processing = await message.reply_text(status_texts.get(lang, status_texts["uz"]))
+    reply = StreamingReply(processing, "🤖 **AI Javob:**\n\n", interval=STREAM_EDIT_INTERVAL, min_chars=STREAM_MIN_CHARS, streaming=STREAM_ANSWERS)
     
-    processing = await message.reply_text(status_texts.get(lang, status_texts["uz"]))
+    def on_event(event, value):
+        if event == "analyzing":
+            reply.show(analyzing_texts.get(lang, analyzing_texts["uz"]))
+        elif event == "fallback":
+            reply.show(fallback_texts.get(lang, fallback_texts["uz"]))
+        elif event == "delta":
+            reply.update(value)
     
     try:
-        all_results = []
-        images = []
-        
-        wiki_results = await search_wikipedia(query, lang)
-        all_results.extend(wiki_results)
-        
-        for result in wiki_results:
-            if result.get("images"):
-                images.extend(result["images"])
-        
-        google_results = await search_google(query)
-        all_results.extend(google_results)
-        
-        ddg_results = await search_duckduckgo(query)
-        all_results.extend(ddg_results)
+        with span("pipeline"):
+            outcome = await flights.run(answer_key, lambda emit: scheduler.slot(lambda: run_pipeline(query, lang, emit)), on_event)
+        await reply.finish()
         
-        bing_results = await search_bing(query)
-        all_results.extend(bing_results)
-        
-        if all_results:
-            collected_info = ""
-            for i, result in enumerate(all_results[:10], 1):
-                collected_info += f"\n\n--- Manba {i} ({result['source']}) ---\n"
-                collected_info += f"Sarlavha: {result.get('title', 'N/A')}\n"
-                collected_info += f"Ma'lumot: {result.get('content', 'N/A')[:500]}\n"
-                if result.get('url'):
-                    collected_info += f"Havola: {result['url']}\n"
-            
-            await processing.edit_text(status_texts.get(lang, "🤖 AI tahlil qilyapti...").replace("Qidiryapman", "AI tahlil qilyapti").replace("Ищу", "AI анализирует").replace("Searching", "AI analyzing"))
+        if outcome["answer"]:
+            with span("telegram_send"):
+                await send_answer(message, processing, outcome["answer"], outcome["images"])
+        elif outcome["results"]:
+            first = outcome["results"][0]
+            simple_response = f"📚 **{first['title']}**\n\n{first['content'][:1000]}"
+            if first.get('url'):
+                simple_response += f"\n\n🔗 [Batafsil]({first['url']})"
             
-            ai_response = await ai_analyze_and_answer(query, collected_info, lang)
-            
-            if ai_response:
-                if images and len(images) > 0:
-                    try:
-                        await message.reply_photo(
-                            images[0],
-                            caption=f"🤖 **AI Javob:**\n\n{ai_response[:900]}"
-                        )
-                        await processing.delete()
-                        return
-                    except:
-                        pass
-                
-                await processing.edit_text(f"🤖 **AI Javob:**\n\n{ai_response}")
-            else:
-                simple_response = f"📚 **{all_results[0]['title']}**\n\n{all_results[0]['content'][:1000]}"
-                if all_results[0].get('url'):
-                    simple_response += f"\n\n🔗 [Batafsil]({all_results[0]['url']})"
-                
-                await processing.edit_text(simple_response, disable_web_page_preview=False)
+            await processing.edit_text(simple_response, disable_web_page_preview=False)
         else:
-            fallback_texts = {
-                "uz": "🔍 Keling, boshqa usulda qidiramiz...",
-                "ru": "🔍 Давайте попробуем другой способ...",
-                "en": "🔍 Let me try another way..."
-            }
-            
-            await processing.edit_text(fallback_texts.get(lang, fallback_texts["uz"]))
-            
-            ai_response = await ai_analyze_and_answer(
-                query, 
-                f"Foydalanuvchi '{query}' haqida so'radi. Umumiy bilimlaringiz asosida javob bering.",
-                lang
-            )
-            
-            if ai_response:
-                await message.reply_text(f"🤖 **AI Javob:**\n\n{ai_response}")
-            else:
-                error_texts = {
-                    "uz": "❌ Xatolik yuz berdi. Qaytadan urinib ko'ring.",
-                    "ru": "❌ Произошла ошибка. Попробуйте снова.",
-                    "en": "❌ An error occurred. Please try again."
-                }
-                await processing.edit_text(error_texts.get(lang, error_texts["uz"]))
+            await processing.edit_text(error_texts.get(lang, error_texts["uz"]))
     
+    except asyncio.CancelledError:
+        await processing.delete()
+        raise
     except Exception as e:
         logger.error(f"Error: {e}")
-        error_texts = {
-            "uz": "❌ Xatolik yuz berdi. Qaytadan urinib ko'ring.",
-            "ru": "❌ Произошла ошибка. Попробуйте снова.",
-            "en": "❌ An error occurred. Please try again."
-        }
         await processing.edit_text(error_texts.get(lang, error_texts["uz"]))
 
+async def main():
+    await app.start()
+    flusher = asyncio.create_task(store.run_flusher())
+    hydration = asyncio.create_task(users.hydrate())
+    lag_monitor = asyncio.create_task(metrics.monitor_loop_lag())
+    metrics_server = await metrics.start_server(METRICS_HOST, METRICS_PORT) if METRICS_PORT else None
+    broadcaster.resume()
+    sync = asyncio.create_task(cluster.run()) if WORKER_COUNT > 1 else None
+    warming = asyncio.create_task(warmer.run()) if WARM_ENABLED and WORKER_INDEX == 0 else None
+    print(f"🚀 Bot ishga tushdi... (worker {WORKER_INDEX + 1}/{WORKER_COUNT})" if WORKER_COUNT > 1 else "🚀 Bot ishga tushdi...")
+    await idle()
+    await app.stop()
+    flusher.cancel()
+    hydration.cancel()
+    if sync:
+        sync.cancel()
+    if warming:
+        warming.cancel()
+    lag_monitor.cancel()
+    if metrics_server:
+        await metrics_server.cleanup()
+    store.close()
+    for index in local_wiki.values():
+        index.close()
+    if disk_cache:
+        disk_cache.close()
+    await http.close()
+
 if __name__ == "__main__":
-    print("🚀 Bot ishga tushdi...")
-    app.run()
+    app.run(main())
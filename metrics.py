@@ -0,0 +1,144 @@
+import time
+import asyncio
+from contextlib import contextmanager
+from aiohttp import web
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+registry = []
+collectors = []
+
+
+def label_text(labels):
+    if not labels:
+        return ""
+    escaped = [(key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for key, value in labels]
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.values = {}
+        registry.append(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in self.values.items():
+            lines.append(f"{self.name}{label_text(labels)} {value}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        self.values[tuple(sorted(labels.items()))] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = buckets
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self.values.get(key)
+        if series is None:
+            series = self.values[key] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, series in self.values.items():
+            for i, bound in enumerate(self.buckets):
+                lines.append(f"{self.name}_bucket{label_text(labels + (('le', bound),))} {series[i]}")
+            lines.append(f"{self.name}_bucket{label_text(labels + (('le', '+Inf'),))} {series[-1]}")
+            lines.append(f"{self.name}_sum{label_text(labels)} {series[-2]}")
+            lines.append(f"{self.name}_count{label_text(labels)} {series[-1]}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("wikibot_stage_seconds", "Latency of each search pipeline stage")
+STAGE_ERRORS = Counter("wikibot_stage_errors_total", "Stage executions that raised an error")
+STAGE_TIMEOUTS = Counter("wikibot_stage_timeouts_total", "Stage executions that hit their deadline")
+SOURCE_RESULTS = Counter("wikibot_source_results_total", "Results returned per search source")
+SOURCE_EMPTY = Counter("wikibot_source_empty_total", "Source lookups that returned no results")
+SOURCE_SKIPPED = Counter("wikibot_source_skipped_total", "Source lookups skipped by an open circuit breaker")
+SOURCE_STATE = Gauge("wikibot_source_circuit_state", "Circuit breaker state per source (0 closed, 1 half-open, 2 open)")
+SOURCE_HEDGES = Gauge("wikibot_source_hedged_requests", "Hedged requests issued per source since start")
+CACHE_HITS = Gauge("wikibot_cache_hits", "Cache hits since start")
+CACHE_MISSES = Gauge("wikibot_cache_misses", "Cache misses since start")
+CACHE_BYTES = Gauge("wikibot_cache_bytes", "Approximate in-memory cache size")
+WARM_RUNS = Counter("wikibot_warm_runs_total", "Answers precomputed by the cache warmer")
+WARM_HITS = Counter("wikibot_warm_hits_total", "User requests served from a warmed answer")
+WARM_SKIPPED = Counter("wikibot_warm_skipped_total", "Warm cycles cut short by load or budget")
+IN_FLIGHT = Gauge("wikibot_searches_in_flight", "Searches currently running or queued")
+LOOP_LAG = Gauge("wikibot_event_loop_lag_seconds", "Most recent event loop scheduling delay")
+LOOP_LAG_SECONDS = Histogram("wikibot_event_loop_lag_distribution_seconds", "Event loop scheduling delay", (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1))
+
+
+@contextmanager
+def span(stage):
+    started = time.perf_counter()
+    try:
+        yield
+    except asyncio.TimeoutError:
+        STAGE_TIMEOUTS.inc(stage=stage)
+        raise
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
+
+
+def render():
+    for collect in collectors:
+        collect()
+    lines = []
+    for metric in registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+async def monitor_loop_lag(interval=0.5):
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - started - interval)
+        LOOP_LAG.set(lag)
+        LOOP_LAG_SECONDS.observe(lag)
+
+
+async def metrics_handler(request):
+    return web.Response(body=render().encode("utf-8"), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+
+async def start_server(host, port):
+    application = web.Application()
+    application.router.add_get("/metrics", metrics_handler)
+    runner = web.AppRunner(application, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
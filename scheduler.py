@@ -0,0 +1,77 @@
+import asyncio
+import logging
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+current_ticket = ContextVar("search_ticket", default=None)
+
+
+class SearchScheduler:
+    def __init__(self, concurrency=20, queue_size=100):
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.active = {}
+        self.tickets = {}
+        self.queued = 0
+        self.waiting = 0
+        self.running = 0
+        self.rejected = 0
+        self.superseded = 0
+
+    def load(self):
+        return (self.running + self.waiting + self.queued) / self.concurrency
+
+    def release(self, ticket):
+        if ticket is not None and ticket["queued"]:
+            ticket["queued"] = False
+            self.queued -= 1
+
+    def submit(self, user_id, factory, shared=False):
+        previous = self.active.get(user_id)
+        replacing = previous is not None and not previous.done()
+        backlog = self.queued + self.waiting
+        if replacing and self.tickets.get(user_id, {}).get("queued"):
+            backlog -= 1
+        if not shared and backlog >= self.queue_size + self.concurrency - self.running:
+            self.rejected += 1
+            return False
+        if replacing:
+            previous.cancel()
+            self.superseded += 1
+        ticket = {"queued": not shared}
+        if not shared:
+            self.queued += 1
+        task = asyncio.create_task(self.run(user_id, factory, ticket))
+        task.add_done_callback(lambda _: self.release(ticket))
+        self.active[user_id] = task
+        self.tickets[user_id] = ticket
+        return True
+
+    async def slot(self, factory):
+        self.release(current_ticket.get())
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            return await factory()
+        finally:
+            self.running -= 1
+            self.semaphore.release()
+
+    async def run(self, user_id, factory, ticket):
+        current_ticket.set(ticket)
+        try:
+            await factory()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Search task error: {e}")
+        finally:
+            if self.active.get(user_id) is asyncio.current_task():
+                del self.active[user_id]
+                del self.tickets[user_id]
@@ -0,0 +1,171 @@
+import time
+import asyncio
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class SourceError(Exception):
+    pass
+
+
+class SourceHealth:
+    def __init__(self, name, empty_is_failure=False, window=50, min_samples=10, failure_rate=0.5,
+                 consecutive_failures=5, cooldown=30, max_cooldown=600, min_hedge_delay=0.3):
+        self.name = name
+        self.empty_is_failure = empty_is_failure
+        self.outcomes = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.failure_rate = failure_rate
+        self.consecutive_limit = consecutive_failures
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.min_hedge_delay = min_hedge_delay
+        self.state = CLOSED
+        self.cooldown = cooldown
+        self.opened_at = 0
+        self.consecutive = 0
+        self.probing = False
+        self.probe_started = 0
+        self.skipped = 0
+        self.hedges = 0
+
+    def failed(self, outcome):
+        return outcome in ("error", "timeout") or (outcome == "empty" and self.empty_is_failure)
+
+    def allow(self):
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+            self.probing = False
+        if self.state == HALF_OPEN and (not self.probing or time.monotonic() - self.probe_started >= self.cooldown):
+            self.probing = True
+            self.probe_started = time.monotonic()
+            return True
+        self.skipped += 1
+        return False
+
+    def record(self, latency, outcome):
+        self.outcomes.append((latency, outcome))
+        if not self.failed(outcome):
+            self.consecutive = 0
+            if self.state != CLOSED:
+                logger.info(f"Source {self.name} recovered")
+                self.outcomes.clear()
+                self.outcomes.append((latency, outcome))
+            self.state = CLOSED
+            self.cooldown = self.base_cooldown
+            return
+        self.consecutive += 1
+        if self.state == HALF_OPEN:
+            self.trip(min(self.cooldown * 2, self.max_cooldown))
+        elif self.state == CLOSED and (self.consecutive >= self.consecutive_limit or self.failure_ratio() >= self.failure_rate):
+            self.trip(self.base_cooldown)
+
+    def release(self):
+        self.probing = False
+
+    def trip(self, cooldown):
+        self.state = OPEN
+        self.cooldown = cooldown
+        self.opened_at = time.monotonic()
+        self.probing = False
+        logger.warning(f"Source {self.name} circuit open for {cooldown}s")
+
+    def failure_ratio(self):
+        if len(self.outcomes) < self.min_samples:
+            return 0.0
+        return sum(1 for _, outcome in self.outcomes if self.failed(outcome)) / len(self.outcomes)
+
+    def rate(self, outcome):
+        if not self.outcomes:
+            return 0.0
+        return sum(1 for _, o in self.outcomes if o == outcome) / len(self.outcomes)
+
+    def latency(self, p):
+        latencies = sorted(latency for latency, outcome in self.outcomes if outcome in ("ok", "empty"))
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))]
+
+    def hedge_delay(self):
+        if self.state != CLOSED or len(self.outcomes) < self.min_samples:
+            return None
+        p95 = self.latency(95)
+        return max(p95, self.min_hedge_delay) if p95 is not None else None
+
+
+def attempt(factory):
+    task = asyncio.create_task(factory())
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    return task
+
+
+class SourceRegistry:
+    def __init__(self, hedging=True):
+        self.sources = {}
+        self.hedging = hedging
+
+    def register(self, name, **options):
+        self.sources[name] = SourceHealth(name, **options)
+
+    def allow(self, name):
+        return self.sources[name].allow()
+
+    async def call(self, name, factory, timeout):
+        health = self.sources[name]
+        started = time.monotonic()
+        deadline = started + timeout
+        hedge_after = health.hedge_delay() if self.hedging else None
+        tasks = {attempt(factory)}
+        error = None
+        try:
+            while tasks:
+                now = time.monotonic()
+                wait = deadline - now
+                if hedge_after is not None:
+                    wait = min(wait, started + hedge_after - now)
+                done, tasks = await asyncio.wait(tasks, timeout=max(0, wait), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        results = task.result()
+                        health.record(time.monotonic() - started, "ok" if results else "empty")
+                        return results
+                    error = task.exception()
+                now = time.monotonic()
+                if now >= deadline:
+                    health.record(now - started, "timeout")
+                    raise asyncio.TimeoutError()
+                if hedge_after is not None and now - started >= hedge_after:
+                    hedge_after = None
+                    health.hedges += 1
+                    tasks.add(attempt(factory))
+            health.record(time.monotonic() - started, "error")
+            raise error
+        except asyncio.CancelledError:
+            health.release()
+            raise
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def status_lines(self):
+        icons = {CLOSED: "🟢", HALF_OPEN: "🟡", OPEN: "🔴"}
+        lines = []
+        for name, health in self.sources.items():
+            p50 = health.latency(50)
+            p95 = health.latency(95)
+            latency = f"{p50 * 1000:.0f}/{p95 * 1000:.0f} ms" if p50 is not None else "—"
+            lines.append(
+                f"{icons[health.state]} **{name}**: {latency}, "
+                f"✅ {health.rate('ok') * 100:.0f}% ∅ {health.rate('empty') * 100:.0f}% "
+                f"❌ {(health.rate('error') + health.rate('timeout')) * 100:.0f}% "
+                f"(n={len(health.outcomes)}, hedge={health.hedges}, skip={health.skipped})"
+            )
+        return lines
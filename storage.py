@@ -0,0 +1,323 @@
+import os
+import sys
+import json
+import hashlib
+import time
+import asyncio
+import sqlite3
+from metrics import span
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    username TEXT,
+    first_name TEXT,
+    joined_date TEXT,
+    search_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS user_language (
+    id INTEGER PRIMARY KEY,
+    lang TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS searches (
+    query TEXT PRIMARY KEY,
+    count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS query_languages (
+    lang TEXT NOT NULL,
+    query TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (lang, query)
+);
+CREATE TABLE IF NOT EXISTS channels (
+    channel TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS ads (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS images (
+    url TEXT PRIMARY KEY,
+    file_id TEXT,
+    valid INTEGER NOT NULL,
+    checked_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS kv (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+UNKNOWN_LANGUAGE = "*"
+
+
+def settle(increments, committed):
+    for key, amount in committed.items():
+        left = increments.get(key, 0) - amount
+        if left:
+            increments[key] = left
+        else:
+            increments.pop(key, None)
+
+
+class Storage:
+    def __init__(self, path, flush_interval=1.0, flush_every=500):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_every = flush_every
+        self.pending = []
+        self.search_increments = {}
+        self.language_increments = {}
+        self.last_flush = time.monotonic()
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def write(self, sql, params=(), counter=None):
+        self.pending.append((sql, params, counter))
+        if len(self.pending) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            committed = (dict(self.search_increments), dict(self.language_increments))
+            with span("db_flush"):
+                with self.conn:
+                    for sql, params, counter in self.pending:
+                        changed = self.conn.execute(sql, params).rowcount
+                        if counter is not None and changed > 0:
+                            self.conn.execute("UPDATE kv SET value = value + ? WHERE key = ?", (counter[1] * changed, counter[0]))
+            self.pending = []
+            settle(self.search_increments, committed[0])
+            settle(self.language_increments, committed[1])
+        self.last_flush = time.monotonic()
+
+    async def run_flusher(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def add_user(self, user_id, username, first_name, joined_date):
+        self.write(
+            "INSERT OR IGNORE INTO users (id, username, first_name, joined_date, search_count) VALUES (?, ?, ?, ?, 0)",
+            (int(user_id), username, first_name, joined_date),
+            counter=("users_total", 1)
+        )
+
+    def incr_user_searches(self, user_id):
+        self.write("UPDATE users SET search_count = search_count + 1 WHERE id = ?", (int(user_id),))
+
+    def delete_user(self, user_id):
+        self.write("DELETE FROM users WHERE id = ?", (int(user_id),), counter=("users_total", -1))
+        self.write("DELETE FROM user_language WHERE id = ?", (int(user_id),))
+
+    def iter_user_ids(self, after=0, limit=500):
+        rows = self.conn.execute("SELECT id FROM users WHERE id > ? ORDER BY id LIMIT ?", (after, limit))
+        return [row[0] for row in rows]
+
+    def iter_user_languages(self, after=0, limit=50000, partition=(0, 1)):
+        return self.conn.execute(
+            "SELECT users.id, user_language.lang FROM users LEFT JOIN user_language ON user_language.id = users.id "
+            "WHERE users.id > ? AND users.id % ? = ? ORDER BY users.id LIMIT ?",
+            (after, partition[1], partition[0], limit)
+        ).fetchall()
+
+    def get_user(self, user_id):
+        return self.conn.execute(
+            "SELECT users.id, user_language.lang FROM users LEFT JOIN user_language ON user_language.id = users.id WHERE users.id = ?",
+            (int(user_id),)
+        ).fetchone()
+
+    def get_language(self, user_id):
+        row = self.conn.execute("SELECT lang FROM user_language WHERE id = ?", (int(user_id),)).fetchone()
+        return row[0] if row else None
+
+    def counter(self, key, seed_sql):
+        self.flush()
+        value = self.get_value(key)
+        if value is None:
+            with self.conn:
+                self.conn.execute(f"INSERT OR IGNORE INTO kv (key, value) SELECT ?, ({seed_sql})", (key,))
+            value = self.get_value(key, 0)
+        return value
+
+    def count_users(self):
+        return self.counter("users_total", "SELECT COUNT(*) FROM users")
+
+    def incr_search(self, query, amount=1):
+        self.search_increments[query] = self.search_increments.get(query, 0) + amount
+        self.write(
+            "INSERT INTO searches (query, count) VALUES (?, ?) ON CONFLICT(query) DO UPDATE SET count = count + excluded.count",
+            (query, amount),
+            counter=("searches_total", amount)
+        )
+        row = self.conn.execute("SELECT count FROM searches WHERE query = ?", (query,)).fetchone()
+        return (row[0] if row else 0) + self.search_increments.get(query, 0)
+
+    def incr_query_language(self, lang, query, amount=1):
+        key = (lang, query)
+        self.language_increments[key] = self.language_increments.get(key, 0) + amount
+        self.write(
+            "INSERT INTO query_languages (lang, query, count) VALUES (?, ?, ?) "
+            "ON CONFLICT(lang, query) DO UPDATE SET count = count + excluded.count",
+            (lang, query, amount)
+        )
+        row = self.conn.execute("SELECT count FROM query_languages WHERE lang = ? AND query = ?", key).fetchone()
+        return (row[0] if row else 0) + self.language_increments.get(key, 0)
+
+    def query_counts(self, lang, min_count=1):
+        return self.conn.execute("SELECT query, count FROM query_languages WHERE lang = ? AND count >= ?", (lang, min_count)).fetchall()
+
+    def backfill_query_languages(self):
+        if self.get_value("query_languages_backfilled"):
+            return False
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO query_languages (lang, query, count) SELECT ?, query, count FROM searches", (UNKNOWN_LANGUAGE,)
+            )
+            self.conn.execute("INSERT OR REPLACE INTO kv (key, value) VALUES ('query_languages_backfilled', 'true')")
+        return True
+
+    def top_searches(self, limit=10):
+        return self.conn.execute("SELECT query, count FROM searches ORDER BY count DESC LIMIT ?", (limit,)).fetchall()
+
+    def total_searches(self):
+        return self.counter("searches_total", "SELECT COALESCE(SUM(count), 0) FROM searches")
+
+    def set_language(self, user_id, lang):
+        self.write(
+            "INSERT INTO user_language (id, lang) VALUES (?, ?) ON CONFLICT(id) DO UPDATE SET lang = excluded.lang",
+            (int(user_id), lang)
+        )
+
+    def add_channel(self, channel):
+        self.write("INSERT OR IGNORE INTO channels (channel) VALUES (?)", (channel,))
+
+    def remove_channel(self, channel):
+        self.write("DELETE FROM channels WHERE channel = ?", (channel,))
+
+    def add_ad(self, ad):
+        self.write("INSERT INTO ads (data) VALUES (?)", (json.dumps(ad, ensure_ascii=False),))
+
+    def get_image(self, url):
+        row = self.conn.execute("SELECT file_id, valid, checked_at FROM images WHERE url = ?", (url,)).fetchone()
+        return (row[0], bool(row[1]), row[2]) if row else None
+
+    def set_image(self, url, file_id, valid):
+        self.write(
+            "INSERT INTO images (url, file_id, valid, checked_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(url) DO UPDATE SET file_id = excluded.file_id, valid = excluded.valid, checked_at = excluded.checked_at",
+            (url, file_id, int(valid), time.time())
+        )
+
+    def get_value(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_value(self, key, value):
+        self.write(
+            "INSERT INTO kv (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, json.dumps(value, ensure_ascii=False))
+        )
+
+    def delete_value(self, key):
+        self.write("DELETE FROM kv WHERE key = ?", (key,))
+
+    def get_values(self, prefix):
+        rows = self.conn.execute("SELECT key, value FROM kv WHERE key >= ? AND key < ?", (prefix, prefix + "\uffff"))
+        return {key: json.loads(value) for key, value in rows}
+
+    def claim_value(self, key, owner, lease):
+        self.flush()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+            value = json.loads(row[0]) if row else None
+            if value is None or (value.get("owner") != owner and time.time() - value.get("heartbeat", 0) < lease):
+                self.conn.rollback()
+                return None
+            value["owner"] = owner
+            value["heartbeat"] = time.time()
+            self.conn.execute("UPDATE kv SET value = ? WHERE key = ?", (json.dumps(value, ensure_ascii=False), key))
+            self.conn.commit()
+            return value
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def update_owned(self, key, owner, value):
+        self.flush()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+            if row is None or json.loads(row[0]).get("owner") != owner:
+                self.conn.rollback()
+                return False
+            self.conn.execute("UPDATE kv SET value = ? WHERE key = ?", (json.dumps(value, ensure_ascii=False), key))
+            self.conn.commit()
+            return True
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def load(self):
+        data = {
+            "channels": [],
+            "ads": [],
+            "admin_state": self.get_value("admin_state", {})
+        }
+        for (channel,) in self.conn.execute("SELECT channel FROM channels ORDER BY rowid"):
+            data["channels"].append(channel)
+        for (ad,) in self.conn.execute("SELECT data FROM ads ORDER BY id"):
+            data["ads"].append(json.loads(ad))
+        return data
+
+    def migrate_json(self, json_path):
+        with open(json_path, 'rb') as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        if self.get_value("json_migrated") == digest:
+            return False
+        if self.get_value("migrated_from") is not None:
+            self.set_value("json_migrated", digest)
+            self.flush()
+            return False
+        data = json.loads(raw.decode('utf-8'))
+        with self.conn:
+            for user_id, user in data.get("users", {}).items():
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO users (id, username, first_name, joined_date, search_count) VALUES (?, ?, ?, ?, ?)",
+                    (int(user_id), user.get("username"), user.get("first_name"), user.get("joined_date"), user.get("search_count", 0))
+                )
+            for user_id, lang in data.get("user_language", {}).items():
+                self.conn.execute("INSERT OR IGNORE INTO user_language (id, lang) VALUES (?, ?)", (int(user_id), lang))
+            for query, count in data.get("searches", {}).items():
+                self.conn.execute("INSERT OR IGNORE INTO searches (query, count) VALUES (?, ?)", (query, count))
+            for channel in data.get("channels", []):
+                self.conn.execute("INSERT OR IGNORE INTO channels (channel) VALUES (?)", (channel,))
+            for ad in data.get("ads", []):
+                ad = json.dumps(ad, ensure_ascii=False)
+                self.conn.execute("INSERT INTO ads (data) SELECT ? WHERE NOT EXISTS (SELECT 1 FROM ads WHERE data = ?)", (ad, ad))
+            self.conn.execute(
+                "INSERT OR IGNORE INTO kv (key, value) VALUES ('admin_state', ?)",
+                (json.dumps(data.get("admin_state", {}), ensure_ascii=False),)
+            )
+            self.conn.execute("DELETE FROM kv WHERE key IN ('users_total', 'searches_total')")
+            self.conn.execute("INSERT OR REPLACE INTO kv (key, value) VALUES ('json_migrated', ?)", (json.dumps(digest),))
+        return True
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "migrate":
+        print("Usage: python storage.py migrate database.json bot.db")
+        sys.exit(1)
+    storage = Storage(sys.argv[3])
+    if storage.migrate_json(sys.argv[2]):
+        print(f"✅ {sys.argv[2]} -> {sys.argv[3]}")
+    else:
+        print("ℹ️ Allaqachon ko'chirilgan")
+    storage.close()
@@ -0,0 +1,80 @@
+import time
+import asyncio
+import logging
+from pyrogram.errors import FloodWait, RPCError
+from metrics import span
+
+logger = logging.getLogger(__name__)
+
+TEXT_LIMIT = 4096
+CAPTION_LIMIT = 1024
+CURSOR = " ▌"
+
+chat_edit_times = {}
+
+
+def split_text(text, limit):
+    if len(text) <= limit:
+        return text, ""
+    cut = text.rfind("\n\n", 0, limit)
+    if cut < limit // 2:
+        cut = text.rfind("\n", 0, limit)
+    if cut < limit // 2:
+        cut = text.rfind(" ", 0, limit)
+    if cut <= 0:
+        cut = limit
+    return text[:cut].rstrip(), text[cut:].lstrip()
+
+
+def chunk_text(text, limit=TEXT_LIMIT):
+    chunks = []
+    while text:
+        chunk, text = split_text(text, limit)
+        chunks.append(chunk)
+    return chunks
+
+
+class StreamingReply:
+    def __init__(self, message, prefix, interval=1.0, min_chars=80, streaming=True):
+        self.message = message
+        self.streaming = streaming
+        self.prefix = prefix
+        self.interval = interval
+        self.min_chars = min_chars
+        self.shown = 0
+        self.task = None
+
+    def update(self, text):
+        if not self.streaming:
+            return
+        if self.task is not None and not self.task.done():
+            return
+        chat_id = self.message.chat.id
+        now = time.monotonic()
+        if len(chat_edit_times) > 10000:
+            for key in [key for key, edited in chat_edit_times.items() if now - edited > 60]:
+                del chat_edit_times[key]
+        if now - chat_edit_times.get(chat_id, 0) < self.interval or len(text) - self.shown < self.min_chars:
+            return
+        chat_edit_times[chat_id] = now
+        self.shown = len(text)
+        preview, rest = split_text(self.prefix + text, TEXT_LIMIT - len(CURSOR))
+        self.task = asyncio.create_task(self.edit(preview + CURSOR))
+
+    def show(self, text):
+        self.task = asyncio.create_task(self.edit(text, self.task))
+
+    async def edit(self, text, previous=None):
+        if previous is not None:
+            await previous
+        try:
+            with span("telegram_edit"):
+                await self.message.edit_text(text)
+        except FloodWait as e:
+            chat_edit_times[self.message.chat.id] = time.monotonic() + e.value
+        except RPCError as e:
+            logger.warning(f"Stream edit error: {e}")
+
+    async def finish(self):
+        if self.task is not None:
+            await self.task
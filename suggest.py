@@ -0,0 +1,86 @@
+import heapq
+from bisect import bisect_left, insort
+from storage import UNKNOWN_LANGUAGE
+
+LAST_CHAR = "\U0010ffff"
+
+
+class PrefixIndex:
+    def __init__(self, top_n=8, scan_limit=256):
+        self.top_n = top_n
+        self.scan_limit = scan_limit
+        self.keys = []
+        self.counts = {}
+        self.tops = {}
+
+    def build(self, items):
+        self.counts = dict(items)
+        self.keys = sorted(self.counts)
+        self.tops = {}
+        self.warm("", 0, len(self.keys))
+
+    def bounds(self, prefix, lo=0, hi=None):
+        lo = bisect_left(self.keys, prefix, lo, len(self.keys) if hi is None else hi)
+        return lo, bisect_left(self.keys, prefix + LAST_CHAR, lo, len(self.keys) if hi is None else hi)
+
+    def compute(self, lo, hi):
+        return heapq.nlargest(self.top_n, ((self.counts[key], key) for key in self.keys[lo:hi]))
+
+    def warm(self, prefix, lo, hi):
+        if hi - lo <= self.scan_limit:
+            return
+        self.tops[prefix] = self.compute(lo, hi)
+        depth = len(prefix)
+        index = lo
+        while index < hi:
+            key = self.keys[index]
+            if len(key) == depth:
+                index += 1
+                continue
+            child = key[:depth + 1]
+            end = bisect_left(self.keys, child + LAST_CHAR, index, hi)
+            self.warm(child, index, end)
+            index = end
+
+    def suggest(self, prefix, limit=8):
+        top = self.tops.get(prefix)
+        if top is None:
+            lo, hi = self.bounds(prefix)
+            top = self.compute(lo, hi)
+            if hi - lo > self.scan_limit:
+                self.tops[prefix] = top
+        return [(query, count) for count, query in top[:limit]]
+
+    def add(self, query, count):
+        if query not in self.counts:
+            insort(self.keys, query)
+        self.counts[query] = count
+        for end in range(len(query) + 1):
+            top = self.tops.get(query[:end])
+            if top is not None and (len(top) < self.top_n or count >= top[-1][0]):
+                top[:] = heapq.nlargest(self.top_n, [entry for entry in top if entry[1] != query] + [(count, query)])
+
+
+class Suggestions:
+    def __init__(self, languages=("uz", "ru", "en"), top_n=8, min_count=3):
+        self.min_count = min_count
+        self.indexes = {language: PrefixIndex(top_n) for language in languages}
+        self.unattributed = PrefixIndex(top_n)
+
+    def load(self, storage):
+        for language, index in self.indexes.items():
+            index.build(storage.query_counts(language, self.min_count))
+        self.unattributed.build(storage.query_counts(UNKNOWN_LANGUAGE, self.min_count))
+
+    def record(self, language, query, count):
+        index = self.indexes.get(language)
+        if index is not None and count >= self.min_count:
+            index.add(query, count)
+
+    def suggest(self, language, prefix, limit=8, unattributed=True):
+        index = self.indexes.get(language)
+        matches = index.suggest(prefix, limit) if index is not None else []
+        if unattributed and len(matches) < limit:
+            seen = {query for query, _ in matches}
+            matches += [match for match in self.unattributed.suggest(prefix, limit) if match[0] not in seen][:limit - len(matches)]
+        return matches
@@ -0,0 +1,54 @@
+import os
+import sys
+import asyncio
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sources import SourceRegistry, HALF_OPEN, CLOSED
+
+
+def half_open_registry():
+    registry = SourceRegistry(hedging=False)
+    registry.register("wiki", consecutive_failures=1, cooldown=0)
+    registry.sources["wiki"].record(0.1, "error")
+    return registry
+
+
+def test_cancelled_probe_releases_half_open_slot():
+    async def scenario():
+        registry = half_open_registry()
+        assert registry.allow("wiki")
+
+        async def hang():
+            await asyncio.sleep(10)
+
+        probe = asyncio.create_task(registry.call("wiki", hang, timeout=5))
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        try:
+            await probe
+        except asyncio.CancelledError:
+            pass
+
+        health = registry.sources["wiki"]
+        assert health.state == HALF_OPEN
+        assert not health.probing
+        assert registry.allow("wiki")
+
+        async def answer():
+            return ["result"]
+
+        assert await registry.call("wiki", answer, timeout=5) == ["result"]
+        assert health.state == CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_stale_probe_expires_after_cooldown():
+    registry = half_open_registry()
+    health = registry.sources["wiki"]
+    assert registry.allow("wiki")
+    health.cooldown = 30
+    assert not registry.allow("wiki")
+    health.probe_started -= 31
+    assert registry.allow("wiki")
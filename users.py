@@ -0,0 +1,158 @@
+import asyncio
+import logging
+from array import array
+from bisect import bisect_left
+
+logger = logging.getLogger(__name__)
+
+LANGUAGES = ("uz", "ru", "en")
+LANGUAGE_CODES = {lang: code for code, lang in enumerate(LANGUAGES)}
+UNSET = 254
+DELETED = 255
+
+
+def pack(user_id, code):
+    return user_id << 8 | code
+
+
+class UserStore:
+    def __init__(self, storage, default_language="uz", batch_size=50000, compact_after=50000, partition=(0, 1)):
+        self.storage = storage
+        self.partition = partition
+        self.default_language = default_language
+        self.batch_size = batch_size
+        self.compact_after = compact_after
+        self.packed = array("q")
+        self.recent = {}
+        self.orphans = {}
+        self.total = None
+        self.loaded_upto = 0
+        self.hydrated = False
+
+    def code(self, lang):
+        return LANGUAGE_CODES.get(lang, UNSET)
+
+    def language(self, code):
+        return LANGUAGES[code] if code < len(LANGUAGES) else self.default_language
+
+    def find(self, user_id):
+        index = bisect_left(self.packed, pack(user_id, 0))
+        if index < len(self.packed) and self.packed[index] >> 8 == user_id:
+            return index
+        return None
+
+    def lookup(self, user_id):
+        if user_id in self.recent:
+            return self.recent[user_id]
+        if self.hydrated or user_id <= self.loaded_upto:
+            index = self.find(user_id)
+            return self.packed[index] & 0xFF if index is not None else None
+        row = self.storage.get_user(user_id)
+        if row is None:
+            return None
+        return self.code(row[1]) if row[1] else UNSET
+
+    def update(self, user_id, code):
+        index = self.find(user_id) if self.hydrated or user_id <= self.loaded_upto else None
+        if index is not None:
+            self.packed[index] = pack(user_id, code)
+            self.recent.pop(user_id, None)
+        else:
+            self.recent[user_id] = code
+            if self.hydrated and len(self.recent) >= self.compact_after:
+                self.compact()
+
+    def exists(self, user_id):
+        code = self.lookup(int(user_id))
+        return code is not None and code != DELETED
+
+    def orphan_language(self, user_id):
+        if user_id not in self.orphans:
+            lang = self.storage.get_language(user_id)
+            if lang is None:
+                return UNSET
+            self.orphans[user_id] = self.code(lang)
+        return self.orphans[user_id]
+
+    def owns(self, user_id):
+        return user_id % self.partition[1] == self.partition[0]
+
+    def add(self, user_id, username, first_name, joined_date):
+        user_id = int(user_id)
+        if self.exists(user_id):
+            if self.partition[1] > 1:
+                self.storage.add_user(user_id, username, first_name, joined_date)
+                code = self.lookup(user_id)
+                if code < len(LANGUAGES):
+                    self.storage.set_language(user_id, self.language(code))
+            return False
+        self.update(user_id, self.orphans.pop(user_id, UNSET))
+        self.storage.add_user(user_id, username, first_name, joined_date)
+        if self.total is not None:
+            self.total += 1
+        return True
+
+    def get_language(self, user_id):
+        user_id = int(user_id)
+        code = self.lookup(user_id)
+        if code is None or code == DELETED:
+            code = self.orphan_language(user_id)
+        return self.language(code)
+
+    def set_language(self, user_id, lang):
+        user_id = int(user_id)
+        if self.exists(user_id):
+            self.update(user_id, self.code(lang))
+        else:
+            self.orphans[user_id] = self.code(lang)
+        self.storage.set_language(user_id, lang)
+
+    def remove(self, user_id):
+        user_id = int(user_id)
+        if self.owns(user_id):
+            if self.exists(user_id) and self.total is not None:
+                self.total -= 1
+            self.orphans.pop(user_id, None)
+            self.update(user_id, DELETED)
+        self.storage.delete_user(user_id)
+
+    def count(self):
+        if self.partition[1] > 1:
+            return self.storage.count_users()
+        if self.total is None:
+            self.storage.flush()
+            self.total = self.storage.count_users()
+        return self.total
+
+    def iter_ids(self, after=0, limit=500):
+        if not self.hydrated or self.partition[1] > 1:
+            return self.storage.iter_user_ids(after, limit)
+        ids = []
+        index = bisect_left(self.packed, pack(after + 1, 0))
+        while index < len(self.packed) and len(ids) < limit:
+            value = self.packed[index]
+            if value & 0xFF != DELETED and value >> 8 not in self.recent:
+                ids.append(value >> 8)
+            index += 1
+        ids.extend(user_id for user_id, code in self.recent.items() if user_id > after and code != DELETED)
+        ids.sort()
+        return ids[:limit]
+
+    def compact(self):
+        live = (value for value in self.packed if value & 0xFF != DELETED and value >> 8 not in self.recent)
+        added = (pack(user_id, code) for user_id, code in self.recent.items() if code != DELETED)
+        self.packed = array("q", sorted([*live, *added]))
+        self.recent = {}
+
+    async def hydrate(self):
+        self.count()
+        while True:
+            rows = self.storage.iter_user_languages(self.loaded_upto, self.batch_size, self.partition)
+            if not rows:
+                break
+            self.packed.extend(pack(user_id, self.code(lang) if lang else UNSET) for user_id, lang in rows)
+            self.loaded_upto = rows[-1][0]
+            await asyncio.sleep(0)
+        self.hydrated = True
+        self.compact()
+        logger.info(f"User store hydrated: {len(self.packed)} users, {self.packed.itemsize * len(self.packed) // 1024} KB")
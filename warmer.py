@@ -0,0 +1,142 @@
+import time
+import asyncio
+import logging
+import metrics
+from analytics import SlidingWindow
+
+logger = logging.getLogger(__name__)
+
+
+class Budget:
+    def __init__(self, per_hour):
+        self.rate = per_hour / 3600
+        self.capacity = per_hour / 4
+        self.available = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def allows(self, amount):
+        self.refill()
+        return self.available >= amount
+
+    def spend(self, amount):
+        self.refill()
+        self.available -= amount
+
+
+class CacheWarmer:
+    def __init__(self, warm, expires_in, load, top, languages=("uz", "ru", "en"), interval=60, max_load=0.5,
+                 request_budget=400, token_budget=100000, requests_per_answer=4, tokens_per_answer=3000,
+                 refresh_before=1800, per_cycle=10, min_rising=2, peers=None):
+        self.warm = warm
+        self.expires_in = expires_in
+        self.load = load
+        self.top = top
+        self.interval = interval
+        self.max_load = max_load
+        self.requests = Budget(request_budget)
+        self.tokens = Budget(token_budget)
+        self.requests_per_answer = requests_per_answer
+        self.tokens_per_answer = tokens_per_answer
+        self.refresh_before = refresh_before
+        self.per_cycle = per_cycle
+        self.min_rising = min_rising
+        self.peers = peers or (lambda: [])
+        self.windows = {language: (SlidingWindow(60, 15), SlidingWindow(3600, 24)) for language in languages}
+        self.warmed = {}
+        self.runs = 0
+        self.hits = 0
+        self.paused = 0
+
+    def observe(self, language, query):
+        windows = self.windows.get(language)
+        if windows is not None:
+            now = time.time()
+            for window in windows:
+                window.add(query, now)
+
+    def served(self, key):
+        if key in self.warmed:
+            self.hits += 1
+            metrics.WARM_HITS.inc()
+
+    def snapshot(self, limit=50):
+        now = time.time()
+        view = {}
+        for language, (short, long) in self.windows.items():
+            baseline = long.counts(now)
+            view[language] = [(query, count, baseline.get(query, count)) for query, count in short.top(limit, now)]
+        return view
+
+    def rising(self, language, limit):
+        short, long = self.windows[language]
+        now = time.time()
+        recent = short.counts(now)
+        baseline = long.counts(now)
+        for snapshot in self.peers():
+            for query, count, total in snapshot.get(language, []):
+                recent[query] = recent.get(query, 0) + count
+                baseline[query] = baseline.get(query, 0) + total
+        ratio = short.bucket_seconds * len(short.buckets) / (long.bucket_seconds * len(long.buckets))
+        scored = []
+        for query, count in recent.items():
+            if count < self.min_rising:
+                continue
+            velocity = count / (baseline.get(query, count) * ratio + 1)
+            scored.append((count * velocity, query))
+        scored.sort(reverse=True)
+        return [query for _, query in scored[:limit]]
+
+    def candidates(self):
+        ranked = {
+            language: self.rising(language, self.per_cycle) + [query for query, _ in self.top(language, self.per_cycle)]
+            for language in self.windows
+        }
+        seen = set()
+        for position in range(max(len(queries) for queries in ranked.values())):
+            for language, queries in ranked.items():
+                if position < len(queries) and (language, queries[position]) not in seen:
+                    seen.add((language, queries[position]))
+                    yield language, queries[position]
+
+    async def cycle(self):
+        warmed = 0
+        for language, query in self.candidates():
+            if warmed >= self.per_cycle:
+                break
+            key = f"{language}:{query}"
+            if self.expires_in(key) > self.refresh_before:
+                continue
+            if self.load() > self.max_load:
+                self.paused += 1
+                metrics.WARM_SKIPPED.inc(reason="load")
+                break
+            if not (self.requests.allows(self.requests_per_answer) and self.tokens.allows(self.tokens_per_answer)):
+                metrics.WARM_SKIPPED.inc(reason="budget")
+                break
+            self.requests.spend(self.requests_per_answer)
+            self.tokens.spend(self.tokens_per_answer)
+            try:
+                with metrics.span("warm"):
+                    await self.warm(language, query)
+            except Exception as e:
+                logger.error(f"Warm error ({key}): {e}")
+                continue
+            self.warmed[key] = time.time()
+            self.runs += 1
+            warmed += 1
+            metrics.WARM_RUNS.inc(lang=language)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            cutoff = time.time() - 86400
+            self.warmed = {key: at for key, at in self.warmed.items() if at >= cutoff}
+            try:
+                await self.cycle()
+            except Exception as e:
+                logger.error(f"Cache warmer error: {e}")
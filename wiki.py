@@ -0,0 +1,71 @@
+PAGE_PROPS = {
+    "prop": "extracts|pageimages|info|pageprops",
+    "exintro": 1,
+    "explaintext": 1,
+    "exlimit": "max",
+    "piprop": "original|thumbnail",
+    "pithumbsize": 1280,
+    "pilimit": "max",
+    "inprop": "url",
+    "ppprop": "disambiguation",
+    "redirects": 1
+}
+
+
+class WikipediaClient:
+    def __init__(self, http, language, api_url=None, timeout=10, extract_chars=1500):
+        self.http = http
+        self.language = language
+        self.api_url = api_url or f"https://{language}.wikipedia.org/w/api.php"
+        self.timeout = timeout
+        self.extract_chars = extract_chars
+
+    async def query(self, params):
+        params = {"action": "query", "format": "json", "formatversion": 2, **PAGE_PROPS, **params}
+        response = await self.http.get(self.api_url, params=params, timeout=self.timeout)
+        pages = response.json().get("query", {}).get("pages", [])
+        return sorted(pages, key=lambda page: page.get("index", 0))
+
+    def to_result(self, page):
+        images = []
+        for key in ("original", "thumbnail"):
+            image = page.get(key, {})
+            if image.get("source"):
+                images.append({"url": image["source"], "width": image.get("width"), "height": image.get("height"), "kind": key})
+        return {
+            "source": "Wikipedia",
+            "title": page["title"],
+            "content": page["extract"][:self.extract_chars],
+            "url": page.get("fullurl", ""),
+            "images": images
+        }
+
+    async def search(self, query, limit=3):
+        pages = await self.query({"generator": "search", "gsrsearch": query, "gsrlimit": limit})
+        results = []
+        disambiguation = []
+        for page in pages:
+            if page.get("missing") or not page.get("extract"):
+                continue
+            if "disambiguation" in page.get("pageprops", {}):
+                disambiguation.append(page["title"])
+                continue
+            results.append(self.to_result(page))
+
+        if disambiguation and len(results) < limit:
+            seen = {result["title"] for result in results}
+            linked = await self.query({
+                "generator": "links",
+                "titles": "|".join(disambiguation),
+                "gplnamespace": 0,
+                "gpllimit": limit * 4
+            })
+            for page in linked:
+                if len(results) >= limit:
+                    break
+                if page.get("missing") or not page.get("extract") or page["title"] in seen:
+                    continue
+                if "disambiguation" in page.get("pageprops", {}):
+                    continue
+                results.append(self.to_result(page))
+        return results